@@ -0,0 +1,103 @@
+"""
+Compare getting the components of a page in a new process, by compiling them
+or loading them from the on-disk cache of compiled templates, and the first
+render of the page against the next one.
+
+Run with ``python -m benchmarks.coldstart``. Each first render runs in a
+process of its own, like a new worker.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.template import Context, Engine
+from django.test.utils import override_settings
+
+from benchmarks.utils import BUILTINS, setup
+from mixin_templatetag.componentnodes import ComponentNode
+from mixin_templatetag.templatecache import get_template_cache
+
+LIBRARY = ''.join(
+    '{%% mixin field%d %%}<label>{{ label }}</label>'
+    '{%% if value and value != "none" %%}<input value="{{ value|default:"" }}">{%% endif %%}'
+    '{%% endmixin %%}' % i
+    for i in range(20)
+)
+
+COMPONENT = (
+    '{% load_mixins "library.html" %}'
+    '<div class="card {{ kind|lower }}">'
+    '<h2>{% slot title %}{{ title|title }}{% endslot %}</h2>'
+    '{% for item in items %}{% if forloop.first %}<ul>{% endif %}'
+    '<li>{% mix field1 with label=item value=item %}{% mix field2 with label=item value=kind %}</li>'
+    '{% if forloop.last %}</ul>{% endif %}{% empty %}{% slot empty %}Nothing{% endslot %}{% endfor %}'
+    '{% slot footer %}{% now "Y" %}{% endslot %}'
+    '</div>'
+)
+
+
+def make_templates(directory, n):
+    with open(os.path.join(directory, 'library.html'), 'w') as fp:
+        fp.write(LIBRARY)
+    for i in range(n):
+        with open(os.path.join(directory, 'card%d.html' % i), 'w') as fp:
+            fp.write(COMPONENT * 5)
+    with open(os.path.join(directory, 'page.html'), 'w') as fp:
+        fp.write(''.join(
+            '{%% component "card%d.html" with title="card" kind="A" items=items %%}'
+            '{%% slot title %%}Card %d{%% endslot %%}{%% endcomponent %%}' % (i, i)
+            for i in range(n)
+        ))
+
+
+def render(directory, cache_dir):
+    """
+    Print the time taken to get the page's components, compiling or loading
+    them, and by the first and second render of the page.
+    """
+    setup()
+    with override_settings(MIXIN_TEMPLATETAG_DISK_CACHE_DIR=cache_dir or None):
+        engine = Engine(dirs=[directory], builtins=BUILTINS)
+        template = engine.get_template('page.html')
+        cache = get_template_cache(engine)
+        start = time.perf_counter()
+        for node in template.nodelist.get_nodes_by_type(ComponentNode):
+            cache.get_template(node.parent_name.var)
+        timings = [time.perf_counter() - start]
+        context = {'items': ['a', 'b', 'c']}
+        for _ in range(2):
+            start = time.perf_counter()
+            template.render(Context(context))
+            timings.append(time.perf_counter() - start)
+    print(' '.join('%f' % timing for timing in timings))
+
+
+def run_process(directory, cache_dir=''):
+    output = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.coldstart', directory, cache_dir],
+        stdout=subprocess.PIPE, check=True, universal_newlines=True,
+    ).stdout
+    return [float(timing) for timing in output.split()]
+
+
+def run(n=200):
+    with tempfile.TemporaryDirectory() as directory, tempfile.TemporaryDirectory() as cache_dir:
+        make_templates(directory, n)
+        results = [
+            ('no disk cache', run_process(directory)),
+            ('filling the disk cache', run_process(directory, cache_dir)),
+            ('from the disk cache', run_process(directory, cache_dir)),
+        ]
+    print('%d components' % n)
+    print('  %-24s %14s %14s %14s' % ('', 'components ms', 'first render', 'second render'))
+    for label, timings in results:
+        print('  %-24s %14.1f %14.1f %14.1f' % ((label,) + tuple(timing * 1000 for timing in timings)))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3:
+        render(*sys.argv[1:])
+    else:
+        run()
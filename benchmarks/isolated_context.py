@@ -0,0 +1,68 @@
+"""
+Compare the contexts ``only`` renders with: ``context.new(values)`` against
+the IsolatedContext made by ``isolate_context``.
+
+Run with ``python -m benchmarks.isolated_context``.
+"""
+from unittest import mock
+
+from django.http import HttpRequest
+from django.template import Context, RequestContext
+
+from benchmarks.utils import allocated_bytes, make_engine, measure
+from mixin_templatetag.utils import isolate_context
+
+TEMPLATES = {
+    'card.html': '<div>{% slot body %}{{ title }}{% endslot %}</div>',
+    'page.html': (
+        '{% mixin badge %}<b>{{ label }}</b>{% endmixin %}'
+        '{% for i in items %}'
+        '{% mix badge with label=i only %}'
+        '{% component "card.html" with title=i only %}{% endcomponent %}'
+        '{% endfor %}'
+    ),
+}
+
+
+def new_context(context, values):
+    return context.new(values)
+
+
+def run(number=200):
+    engine = make_engine(TEMPLATES)
+    template = engine.get_template('page.html')
+    request = HttpRequest()
+    values = {'label': 'x'}
+    renders = 2 * 100
+
+    for name, context in (
+        ('Context', Context({'items': range(100)})),
+        ('RequestContext', RequestContext(request, {'items': range(100)}, processors=[lambda request: {}])),
+    ):
+        def render():
+            with context.render_context.push_state(template):
+                with context.bind_template(template):
+                    template._render(context)
+
+        results = {}
+        for label, isolate in (('new', new_context), ('isolated', isolate_context)):
+            with mock.patch('mixin_templatetag.mixinnodes.isolate_context', isolate), \
+                    mock.patch('mixin_templatetag.componentnodes.isolate_context', isolate):
+                results[label] = measure(render, number)
+
+            def create():
+                return isolate(context, values)
+
+            results[label]['bytes_per_context'] = allocated_bytes(create)
+            results[label]['usec_per_context'] = measure(create, number * 100)['usec_per_call']
+
+        print(name)
+        for label, result in results.items():
+            print('  %-9s %8.1f us/page %6.2f us/render %6.3f us/context %6d bytes/context' % (
+                label, result['usec_per_call'], result['usec_per_call'] / renders,
+                result['usec_per_context'], result['bytes_per_context'],
+            ))
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,58 @@
+"""
+Time the parsing of synthetic templates with thousands of mixins, mixes and
+components, which is paid on every render when the cached loader is off.
+
+Run with ``python -m benchmarks.parsing``.
+"""
+from benchmarks.utils import make_engine, measure
+
+COMPONENT = '<div>{% slot title %}{{ title }}{% endslot %}{% slot body %}{% endslot %}</div>'
+
+
+def many_mixins(n):
+    """``n`` mixins, each mixed once."""
+    return (
+        ''.join('{%% mixin m%d %%}<b>{{ name }}</b>{%% endmixin %%}' % i for i in range(n))
+        + ''.join('{%% mix m%d %%}' % i for i in range(n))
+    )
+
+
+def many_mixes(n):
+    """One mixin mixed ``n`` times with arguments."""
+    return (
+        '{% mixin item %}<li>{{ name }}{{ index }}</li>{% endmixin %}'
+        + ''.join('{%% mix item with name="item" index=%d only %%}' % i for i in range(n))
+    )
+
+
+def many_components(n):
+    """``n`` components with arguments and a slot override."""
+    return ''.join(
+        '{%% component "card.html" with title="card %d" index=%d only %%}'
+        '{%% slot body %%}{{ index }}{%% endslot %%}{%% endcomponent %%}' % (i, i)
+        for i in range(n)
+    )
+
+
+CASES = (many_mixins, many_mixes, many_components)
+
+
+def run(sizes=(100, 1000, 5000), number=20):
+    engine = make_engine({'card.html': COMPONENT})
+    print('%-16s %6s %12s %10s %12s' % ('case', 'size', 'us/parse', 'us/tag', 'peak bytes'))
+    for case in CASES:
+        for size in sizes:
+            source = case(size)
+
+            def parse():
+                engine.from_string(source)
+
+            result = measure(parse, number)
+            print('%-16s %6d %12.1f %10.2f %12d' % (
+                case.__name__, size, result['usec_per_call'], result['usec_per_call'] / size,
+                result['peak_bytes'],
+            ))
+
+
+if __name__ == '__main__':
+    run()
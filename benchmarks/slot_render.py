@@ -0,0 +1,89 @@
+"""
+Compare rendering slots through per-render SlotHandle objects against the
+previous approach of cloning the SlotNode on every render.
+
+Run with ``python -m benchmarks.slot_render``.
+"""
+from django.template import Context
+from django.utils.safestring import mark_safe
+
+from benchmarks.utils import allocated_bytes, make_engine, measure
+from mixin_templatetag.componentnodes import SLOT_CONTEXT_KEY, SlotHandle, SlotNode
+
+SLOTS = 20
+
+TEMPLATES = {
+    'component.html': ''.join(
+        '<p>{%% slot s%d %%}default {{ i }}{%% endslot %%}</p>' % n for n in range(SLOTS)
+    ),
+    'page.html': (
+        '{% for i in items %}{% component "component.html" %}'
+        + ''.join('{%% slot s%d %%}override {{ i }}{%% endslot %%}' % n for n in range(0, SLOTS, 2))
+        + '{% endcomponent %}{% endfor %}'
+    ),
+}
+
+
+class CloningSlotNode(SlotNode):
+    """
+    The SlotNode render path before SlotHandle, kept for comparison. Like the
+    SlotNode of then, it has an instance dict to hold the context.
+    """
+
+    def render_slot(self, context, slot_context):
+        override = slot_context.pop(self.name)
+        slot = self if override is None else override
+        try:
+            with context.push():
+                slot = CloningSlotNode(slot.name, slot.nodelist)
+                slot.context = context
+                context['slot'] = slot
+                return slot.nodelist.render(context)
+        finally:
+            if override is not None:
+                slot_context.push(self.name, override)
+
+    def super(self):
+        render_context = self.context.render_context
+        if render_context[SLOT_CONTEXT_KEY].get_slot(self.name) is not None:
+            return mark_safe(self.render(self.context))
+        return ''
+
+
+def run(number=200):
+    engine = make_engine(TEMPLATES)
+    template = engine.get_template('page.html')
+    context = {'items': range(50)}
+    renders = SLOTS * 50
+
+    def render():
+        template.render(Context(context))
+
+    results = {'handle': measure(render, number)}
+    render_slot = SlotNode.render_slot
+    SlotNode.render_slot = CloningSlotNode.render_slot
+    try:
+        results['clone'] = measure(render, number)
+    finally:
+        SlotNode.render_slot = render_slot
+
+    node = template.nodelist[0].nodelist_loop[0].slots['s0']
+    context = Context()
+
+    def clone():
+        slot = CloningSlotNode(node.name, node.nodelist)
+        slot.context = context
+        return slot
+
+    results['handle']['bytes_per_slot'] = allocated_bytes(lambda: SlotHandle(node, node, context))
+    results['clone']['bytes_per_slot'] = allocated_bytes(clone)
+
+    for name, result in results.items():
+        print('%-8s %8.1f us/page %6.2f us/slot %6d bytes/slot %8d peak bytes/page' % (
+            name, result['usec_per_call'], result['usec_per_call'] / renders,
+            result['bytes_per_slot'], result['peak_bytes'],
+        ))
+
+
+if __name__ == '__main__':
+    run()
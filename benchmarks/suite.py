@@ -0,0 +1,203 @@
+"""
+Benchmarks comparing mixins and components with Django's include and
+extends/block, over a range of sizes and with and without the cached loader.
+
+Run with ``python -m benchmarks.suite``; ``--output results.json`` saves the
+results and ``--compare old.json`` prints the change against an earlier run.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+
+import django
+from django.template import Context
+
+import mixin_templatetag
+from benchmarks.utils import make_engine, profile
+
+PAGE = 'page.html'
+
+
+def mixes(n):
+    """A page mixing the same mixin ``n`` times."""
+    return {PAGE: (
+        '{% mixin item %}<li>{{ name }}</li>{% endmixin %}<ul>'
+        + ''.join('{%% mix item with name="item %d" %%}' % i for i in range(n))
+        + '</ul>'
+    )}, {}
+
+
+def includes(n):
+    """A page including the same template ``n`` times."""
+    return {
+        'item.html': '<li>{{ name }}</li>',
+        PAGE: '<ul>' + ''.join('{%% include "item.html" with name="item %d" %%}' % i for i in range(n)) + '</ul>',
+    }, {}
+
+
+def nested_components(depth):
+    """Components nested ``depth`` deep, each passing a slot to the next."""
+    templates = {'level%d.html' % depth: '<div>{% slot body %}leaf{% endslot %}</div>'}
+    for level in range(depth - 1, 0, -1):
+        templates['level%d.html' % level] = (
+            '<div>{%% component "level%d.html" %%}{%% slot body %%}'
+            '{%% slot body %%}level %d{%% endslot %%}{%% endslot %%}{%% endcomponent %%}</div>' % (level + 1, level)
+        )
+    templates[PAGE] = '{% component "level1.html" %}{% slot body %}page{% endslot %}{% endcomponent %}'
+    return templates, {}
+
+
+def nested_extends(depth):
+    """A chain of ``depth`` templates extending each other."""
+    templates = {'level%d.html' % depth: '<div>{% block body %}leaf{% endblock %}</div>'}
+    for level in range(depth - 1, 0, -1):
+        templates['level%d.html' % level] = (
+            '{%% extends "level%d.html" %%}{%% block body %%}<div>level %d{{ block.super }}</div>{%% endblock %%}'
+            % (level + 1, level)
+        )
+    templates[PAGE] = '{% extends "level1.html" %}{% block body %}page{% endblock %}'
+    return templates, {}
+
+
+def component_slots(n):
+    """A component with ``n`` slots, all overridden."""
+    return {
+        'component.html': ''.join('<p>{%% slot s%d %%}default{%% endslot %%}</p>' % i for i in range(n)),
+        PAGE: (
+            '{% component "component.html" %}'
+            + ''.join('{%% slot s%d %%}slot %d{%% endslot %%}' % (i, i) for i in range(n))
+            + '{% endcomponent %}'
+        ),
+    }, {}
+
+
+def extends_blocks(n):
+    """A template extending one with ``n`` blocks, all overridden."""
+    return {
+        'base.html': ''.join('<p>{%% block b%d %%}default{%% endblock %%}</p>' % i for i in range(n)),
+        PAGE: '{% extends "base.html" %}' + ''.join('{%% block b%d %%}block %d{%% endblock %%}' % (i, i) for i in range(n)),
+    }, {}
+
+
+def component_loop(n):
+    """A component rendered for each of ``n`` items."""
+    return {
+        'card.html': '<div>{% slot title %}{{ item }}{% endslot %}</div>',
+        PAGE: (
+            '{% for item in items %}{% component "card.html" with item=item only %}'
+            '{% slot title %}<b>{{ item }}</b>{% endslot %}{% endcomponent %}{% endfor %}'
+        ),
+    }, {'items': list(range(n))}
+
+
+def component_for_loop(n):
+    """The same component rendered for ``n`` items with component_for."""
+    return {
+        'card.html': '<div>{% slot title %}{{ item }}{% endslot %}</div>',
+        PAGE: (
+            '{% component_for item in items "card.html" with item=item only %}'
+            '{% slot title %}<b>{{ item }}</b>{% endslot %}{% endcomponent_for %}'
+        ),
+    }, {'items': list(range(n))}
+
+
+def include_loop(n):
+    """An include rendered for each of ``n`` items."""
+    return {
+        'card.html': '<div><b>{{ item }}</b></div>',
+        PAGE: '{% for item in items %}{% include "card.html" with item=item only %}{% endfor %}',
+    }, {'items': list(range(n))}
+
+
+# Scenario name mapped to the functions building its templates, the last one
+# being the baseline they're compared against, and the sizes to run.
+SCENARIOS = {
+    'mixes': ((mixes, includes), (10, 100, 1000)),
+    'nesting': ((nested_components, nested_extends), (2, 5, 10)),
+    'slots': ((component_slots, extends_blocks), (1, 10, 50)),
+    'loop': ((component_loop, component_for_loop, include_loop), (10, 100, 500)),
+}
+
+
+def run_case(build, size, cached, number):
+    templates, context = build(size)
+    engine = make_engine(templates, cached=cached)
+
+    def render():
+        engine.get_template(PAGE).render(Context(context))
+
+    result = profile(render, number)
+    result.update(case=build.__name__, size=size, cached=cached)
+    return result
+
+
+def run(names=None, number=200):
+    results = []
+    for name, (builders, sizes) in SCENARIOS.items():
+        if names and name not in names:
+            continue
+        for size in sizes:
+            for cached in (True, False):
+                for build in builders:
+                    result = run_case(build, size, cached, number)
+                    result['scenario'] = name
+                    results.append(result)
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'mixin_templatetag': mixin_templatetag.__version__,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'number': number,
+        'results': results,
+    }
+
+
+def result_key(result):
+    return result['case'], result['size'], result['cached']
+
+
+def report(run, baseline=None, stream=sys.stdout):
+    previous = {result_key(result): result for result in (baseline or {}).get('results', ())}
+    stream.write('%-20s %5s %7s %12s %10s %10s %10s %12s%s\n' % (
+        'case', 'size', 'loader', 'renders/s', 'p50 us', 'p90 us', 'p99 us', 'peak bytes',
+        '  vs baseline' if baseline else '',
+    ))
+    for result in run['results']:
+        line = '%-20s %5d %7s %12.1f %10.1f %10.1f %10.1f %12d' % (
+            result['case'], result['size'], 'cached' if result['cached'] else 'plain',
+            result['calls_per_sec'], result['p50_usec'], result['p90_usec'], result['p99_usec'],
+            result['peak_bytes'],
+        )
+        old = previous.get(result_key(result))
+        if old:
+            line += '  %+6.1f%%' % ((result['calls_per_sec'] / old['calls_per_sec'] - 1) * 100)
+        stream.write(line + '\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('scenarios', nargs='*', metavar='scenario',
+                        help='Scenarios to run (%s), all of them by default.' % ', '.join(SCENARIOS))
+    parser.add_argument('--number', type=int, default=200, help='Renders per case.')
+    parser.add_argument('--output', help='Write the results to this JSON file.')
+    parser.add_argument('--compare', help='JSON file of an earlier run to compare throughput with.')
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error('unknown scenarios: %s' % ', '.join(sorted(unknown)))
+
+    results = run(args.scenarios, args.number)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Render one set of compiled templates with nested components, slots and mixes
+from a growing thread pool, checking every output against the one rendered by
+a single thread and reporting the throughput at each thread count.
+
+Run with ``python -m benchmarks.threads``; ``--compile`` renders through the
+nodelist compiler and ``--stress`` makes threads switch as often as possible
+to shake out races. It exits with an error if any output differs.
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.template import Context
+
+from mixin_templatetag import compiler
+from benchmarks.utils import make_engine
+
+TEMPLATES = {
+    'card.html': (
+        '<div class="card">{% slot title %}{{ title }}{% endslot %}'
+        '<section>{% slot body %}no body{% endslot %}</section>'
+        '<footer>{% slot title %}{% endslot %}</footer></div>'
+    ),
+    'panel.html': (
+        '<div class="panel">'
+        '{% component "card.html" with title=name %}'
+        '{% slot title %}<h2>{{ name }}</h2>{% endslot %}'
+        '{% slot body %}{% slot content %}empty panel{% endslot %}{% endslot %}'
+        '{% endcomponent %}</div>'
+    ),
+    'page.html': (
+        '{% mixin badge %}<b>{{ label }}</b>{% endmixin %}'
+        '{% component "panel.html" with name=user %}'
+        '{% slot content %}'
+        '{% for item in items %}'
+        '{% mix badge with label=item only %}'
+        '{% component "card.html" with title=item only dedupe %}{% endcomponent %}'
+        '{% endfor %}'
+        '{% component_for item in items "card.html" with title=user %}'
+        '{% slot body %}{{ user }}:{{ item }}:{{ forloop.counter }}{% endslot %}'
+        '{% endcomponent_for %}'
+        '{% endslot %}'
+        '{% endcomponent %}'
+    ),
+}
+
+
+def make_context(index):
+    # Every render gets its own values, so outputs leaking between threads
+    # show up as mismatches.
+    return {'user': 'user%d' % index, 'items': ['item%d' % (index + i) for i in range(5)]}
+
+
+def run(thread_counts=(1, 2, 4, 8, 16), renders=2000, users=50):
+    engine = make_engine(TEMPLATES)
+    template = engine.get_template('page.html')
+    expected = [template.render(Context(make_context(index))) for index in range(users)]
+
+    def render(index):
+        return template.render(Context(make_context(index % users))) == expected[index % users]
+
+    print('%8s %12s %10s' % ('threads', 'renders/s', 'mismatches'))
+    mismatches = 0
+    for threads in thread_counts:
+        with ThreadPoolExecutor(threads) as executor:
+            start = time.perf_counter()
+            results = list(executor.map(render, range(renders)))
+            elapsed = time.perf_counter() - start
+        failed = results.count(False)
+        mismatches += failed
+        print('%8d %12.1f %10d' % (threads, renders / elapsed, failed))
+    return mismatches
+
+
+def stress(thread_counts, renders):
+    # Switching threads far more often than usual makes races between
+    # renders much more likely to show up.
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        return run(thread_counts, renders)
+    finally:
+        sys.setswitchinterval(interval)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8, 16], help='Thread counts to run.')
+    parser.add_argument('--renders', type=int, default=2000, help='Renders per thread count.')
+    parser.add_argument('--compile', action='store_true', help='Render through the nodelist compiler.')
+    parser.add_argument('--stress', action='store_true',
+                        help='Switch threads as often as possible; throughput is then meaningless.')
+    args = parser.parse_args(argv)
+    compiler.enabled = args.compile
+    if (stress if args.stress else run)(args.threads, args.renders):
+        sys.exit('Some renders differed from the single-threaded output.')
+
+
+if __name__ == '__main__':
+    main()
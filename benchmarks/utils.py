@@ -0,0 +1,102 @@
+import time
+import tracemalloc
+
+import django
+from django.conf import settings
+from django.template import Engine
+
+BUILTINS = ['mixin_templatetag.templatetags.mixins']
+
+
+def setup():
+    if not settings.configured:
+        settings.configure(INSTALLED_APPS=['mixin_templatetag'])
+        django.setup()
+
+
+def make_engine(templates, cached=True):
+    """
+    Return an engine that loads ``templates`` (a dict of name to source) from
+    memory, optionally through the cached loader.
+    """
+    setup()
+    loaders = [('django.template.loaders.locmem.Loader', templates)]
+    if cached:
+        loaders = [('django.template.loaders.cached.Loader', loaders)]
+    return Engine(loaders=loaders, builtins=BUILTINS)
+
+
+def measure(func, number=1000):
+    """
+    Call ``func`` ``number`` times and return the mean time per call in
+    microseconds and the peak memory, in bytes, allocated during one call.
+    """
+    func()  # warm up caches
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+    elapsed = time.perf_counter() - start
+
+    return {
+        'usec_per_call': elapsed / number * 1e6,
+        'peak_bytes': peak_bytes(func),
+    }
+
+
+def peak_bytes(func):
+    """
+    Return the peak memory, in bytes, allocated during one call to ``func``.
+    """
+    # The peak starts at zero when tracing starts, so there's no need for
+    # tracemalloc.reset_peak(), which needs Python 3.9.
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def allocated_bytes(factory, number=1000):
+    """
+    Return the bytes allocated, and kept, by one call to ``factory`` averaged
+    over ``number`` calls.
+    """
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        objects = [factory() for _ in range(number)]
+        allocated = tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        tracemalloc.stop()
+    del objects
+    return allocated / number
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(percent / 100.0 * len(values))) - 1))
+    return values[index]
+
+
+def profile(func, number=200):
+    """
+    Call ``func`` ``number`` times and return its throughput, latency
+    percentiles in microseconds and the peak memory, in bytes, of one call.
+    """
+    func()  # warm up caches
+    timings = []
+    start = time.perf_counter()
+    for _ in range(number):
+        call_start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - call_start) * 1e6)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'calls_per_sec': number / elapsed,
+        'p50_usec': percentile(timings, 50),
+        'p90_usec': percentile(timings, 90),
+        'p99_usec': percentile(timings, 99),
+        'peak_bytes': peak_bytes(func),
+    }
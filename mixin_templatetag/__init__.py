@@ -4,3 +4,6 @@
 __author__ = 'Benjamin Lei'
 
 __version__ = '0.3.1'
+
+# Django < 3.2 doesn't pick up the AppConfig in apps.py on its own.
+default_app_config = 'mixin_templatetag.apps.MixinTemplatetagConfig'
@@ -0,0 +1,26 @@
+import logging
+
+from django.apps import AppConfig
+from django.conf import settings
+
+logger = logging.getLogger('mixin_templatetag')
+
+
+class MixinTemplatetagConfig(AppConfig):
+    name = 'mixin_templatetag'
+
+    def ready(self):
+        from mixin_templatetag import compiler
+        compiler.enabled = getattr(settings, 'MIXIN_TEMPLATETAG_COMPILE', False)
+        if getattr(settings, 'MIXIN_TEMPLATETAG_STATS', False):
+            from mixin_templatetag import stats
+            stats.enable()
+        if getattr(settings, 'MIXIN_TEMPLATETAG_PRECOMPILE', False):
+            self.precompile_templates()
+
+    def precompile_templates(self):
+        from mixin_templatetag.precompile import get_engines, precompile_templates
+        for alias, engine in get_engines().items():
+            for result in precompile_templates(engine):
+                if result.error is not None:
+                    logger.error("Template %r failed to compile: %s", result.template_name, result.error)
@@ -0,0 +1,134 @@
+"""
+Render templates from async code, awaiting awaitable ``with`` values.
+
+Components and mixes next to each other in a template have their arguments
+resolved together, so awaitable values are awaited concurrently, and are then
+rendered one after another so the output keeps its order. The contents of
+Django's if, for, with, extends and block tags are rendered the same way.
+Other nodes are rendered as usual, so components and mixes inside other tags
+don't get their awaitable arguments awaited, and act as a barrier, since they
+may change the context that later arguments are resolved in::
+
+    async def dashboard(request):
+        template = get_template('dashboard.html')
+        return HttpResponse(await arender_template(template, {'user': request.user}, request))
+"""
+import asyncio
+from inspect import isawaitable
+
+from django.template import Context
+from django.template.base import TextNode, VariableNode
+from django.template.defaulttags import ForNode, IfNode, WithNode
+from django.template.context import make_context
+from django.template.loader_tags import BlockNode, ExtendsNode
+from django.utils.safestring import mark_safe
+
+from mixin_templatetag.utils import get_extends_parent, get_if_nodelist, iter_for_loop, push_block, push_with
+
+# Nodes that don't change the context, so arguments of the nodes after them
+# can be resolved before they render.
+PASSIVE_NODES = (TextNode, VariableNode)
+
+
+async def aresolve_values(extra_context, context):
+    values = {
+        name: var.resolve(context)
+        for name, var in extra_context.items()
+    }
+    pending = [name for name, value in values.items() if isawaitable(value)]
+    if pending:
+        results = await asyncio.gather(*(values[name] for name in pending))
+        values.update(zip(pending, results))
+    return values
+
+
+async def arender_extends(node, context):
+    compiled_parent = get_extends_parent(node, context)
+    with context.render_context.push_state(compiled_parent, isolated_context=False):
+        return await arender_nodelist(compiled_parent.nodelist, context)
+
+
+async def arender_block(node, context):
+    with push_block(node, context) as block:
+        return await arender_nodelist(block.nodelist, context)
+
+
+async def arender_for(node, context):
+    bits = []
+    for nodelist in iter_for_loop(node, context):
+        bits.append(await arender_nodelist(nodelist, context))
+    return mark_safe(''.join(bits))
+
+
+async def arender_if(node, context):
+    nodelist = get_if_nodelist(node, context)
+    if nodelist is None:
+        return ''
+    return await arender_nodelist(nodelist, context)
+
+
+async def arender_with(node, context):
+    with push_with(node, context):
+        return await arender_nodelist(node.nodelist, context)
+
+
+RENDERERS = {
+    ExtendsNode: arender_extends,
+    BlockNode: arender_block,
+    ForNode: arender_for,
+    IfNode: arender_if,
+    WithNode: arender_with,
+}
+
+
+async def arender_run(run, context, bits):
+    resolved = await asyncio.gather(*(node.aresolve(context) for node in run if hasattr(node, 'aresolve')))
+    resolved = iter(resolved)
+    for node in run:
+        if hasattr(node, 'aresolve'):
+            bits.append(await node.arender_resolved(context, next(resolved)))
+        else:
+            bits.append(node.render_annotated(context))
+
+
+async def arender_nodelist(nodelist, context):
+    bits = []
+    run = []
+    for node in nodelist:
+        if hasattr(node, 'aresolve') or isinstance(node, PASSIVE_NODES):
+            run.append(node)
+            continue
+        if run:
+            await arender_run(run, context, bits)
+            run = []
+        renderer = RENDERERS.get(type(node))
+        if renderer is not None:
+            bits.append(await renderer(node, context))
+        else:
+            bits.append(node.render_annotated(context))
+    if run:
+        await arender_run(run, context, bits)
+    return mark_safe(''.join(bits))
+
+
+async def arender_template(template, context=None, request=None):
+    """
+    Render ``template`` like its ``render()`` method, awaiting awaitable
+    arguments of components and mixes. ``template`` may be a
+    ``django.template.Template`` or a template returned by a
+    ``DjangoTemplates`` backend.
+    """
+    if hasattr(template, 'backend'):
+        # django.template.backends.django.Template
+        context = make_context(context, request, autoescape=template.backend.engine.autoescape)
+        template = template.template
+    elif context is None:
+        context = Context()
+
+    # Mirrors Template.render.
+    with context.render_context.push_state(template):
+        if context.template is None:
+            with context.bind_template(template):
+                context.template_name = template.name
+                return await arender_nodelist(template.nodelist, context)
+        return await arender_nodelist(template.nodelist, context)
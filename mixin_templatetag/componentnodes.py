@@ -1,56 +1,221 @@
-from collections import defaultdict
+from collections import deque
 
-from django.template import TemplateSyntaxError, Node, Template, Variable
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+from django.template import TemplateSyntaxError, Node, Template, Variable, VariableDoesNotExist
+from django.template.defaulttags import IfNode
 from django.template.loader_tags import ExtendsNode, IncludeNode
 from django.utils.safestring import mark_safe
 
+from mixin_templatetag import compiler, stats
+from mixin_templatetag.asyncrender import aresolve_values, arender_nodelist
+from mixin_templatetag.streaming import iter_nodelist
+from mixin_templatetag.templatecache import get_template_cache
+from mixin_templatetag.utils import EMPTY_MAPPING, isolate_context, nodelist_fingerprint, static_output
+
 SLOT_CONTEXT_KEY = 'slot_context'
+DEDUPE_CONTEXT_KEY = 'component_dedupe'
 
 
 class SlotContext:
+    """
+    Slot overrides of the components being rendered. Each slot name maps to a
+    stack with the outermost component's override on top, so the template
+    using a component has the last word on its slots; a component puts its
+    overrides beneath the ones already there when it starts rendering and
+    removes them when it's done.
+    Each component being rendered also gets the output of the overrides it
+    rendered, so slots referenced more than once only render once.
+    It lives in the render context, so every render has its own and the
+    shared nodes are never written to while rendering.
+    """
+    __slots__ = ('slots', 'outputs')
+
     def __init__(self):
-        # Dictionary of FIFO queues.
-        self.slots = defaultdict(list)
+        self.slots = {}
+        self.outputs = []
 
-    def add_slots(self, slots):
+    def add_slots(self, slots, layout=None):
         for name, slot in slots.items():
-            self.slots[name].insert(0, slot)
+            try:
+                self.slots[name].appendleft(slot)
+            except KeyError:
+                self.slots[name] = deque((slot,))
+        self.outputs.append((layout.memoized if layout is not None else frozenset(), {}))
+
+    def remove_slots(self, slots):
+        for name in slots:
+            stack = self.slots[name]
+            stack.popleft()
+            if not stack:
+                del self.slots[name]
+        self.outputs.pop()
+
+    def get_outputs(self, node, slot):
+        """
+        Return the rendered overrides of the innermost component, if ``slot``
+        rendered at ``node`` can be taken from and stored in them.
+        """
+        if slot is node or not slot.memoize or not self.outputs:
+            return None
+        memoized, outputs = self.outputs[-1]
+        return outputs if node in memoized else None
+
+    def clear_outputs(self):
+        # The component is rendered again with other values.
+        if self.outputs:
+            self.outputs[-1][1].clear()
 
     def pop(self, name):
-        try:
-            return self.slots[name].pop()
-        except IndexError:
+        stack = self.slots.get(name)
+        if not stack:
             return None
+        slot = stack.pop()
+        if not stack:
+            del self.slots[name]
+        return slot
 
     def push(self, name, slot):
-        self.slots[name].append(slot)
+        try:
+            self.slots[name].append(slot)
+        except KeyError:
+            self.slots[name] = deque((slot,))
 
     def get_slot(self, name):
-        try:
-            return self.slots[name][-1]
-        except IndexError:
-            return None
+        stack = self.slots.get(name)
+        return stack[-1] if stack else None
+
+
+class ComponentLayout:
+    """
+    What a compiled component template looks like to ComponentNode.render:
+    worked out once per template instead of on every render.
+    """
+    __slots__ = ('memoized',)
+
+    def __init__(self, template):
+        for node in template.nodelist:
+            if isinstance(node, ExtendsNode):
+                raise TemplateSyntaxError(
+                    "Component template %r must not extend another template"
+                    % (template.origin.template_name or template.origin.name)
+                )
+        # Slots whose override renders the same wherever they are, because no
+        # tag around them changes the context: they share one render.
+        self.memoized = set()
+        self.find_slots(template.nodelist, True)
+
+    def find_slots(self, nodelist, stable):
+        for node in nodelist:
+            if isinstance(node, SlotNode):
+                if stable and not node.rerender:
+                    self.memoized.add(node)
+                self.find_slots(node.nodelist, stable)
+            elif isinstance(node, ComponentNode):
+                # A nested component's slots override its own parent; only
+                # their contents are rendered in this template.
+                for slot in node.slots.values():
+                    self.find_slots(slot.nodelist, False)
+            else:
+                for attr in node.child_nodelists:
+                    self.find_slots(getattr(node, attr, None) or (), stable and isinstance(node, IfNode))
+
+
+def get_component_layout(template):
+    try:
+        return template.mixin_component_layout
+    except AttributeError:
+        # The layout is only set once it's complete; threads racing here each
+        # work out the same one.
+        layout = template.mixin_component_layout = ComponentLayout(template)
+        return layout
+
+
+def get_slot_fingerprint(slot):
+    try:
+        return slot.mixin_fingerprint
+    except AttributeError:
+        fingerprint = slot.mixin_fingerprint = nodelist_fingerprint(slot.nodelist)
+        return fingerprint
+
+
+class ComponentScope:
+    """
+    The setup of a component template's render, shared by every way of
+    rendering it. Entering makes the component's overrides visible to the
+    template's slots, makes the template the one being rendered and pushes
+    the ``with`` values, and returns the context to render the template's
+    nodelist in: the same context, or a new one holding only the values with
+    ``only``. Exiting undoes it all. Without values, the context is returned
+    as is, for ComponentForNode to push each item's own.
+    """
+    __slots__ = ('node', 'template', 'context', 'values', 'slot_context', 'initial')
+
+    def __init__(self, node, template, context, values=None):
+        self.node, self.template, self.context, self.values = node, template, context, values
+
+    def __enter__(self):
+        # Raises if the template extends another one.
+        layout = get_component_layout(self.template)
+
+        render_context = self.context.render_context
+        if SLOT_CONTEXT_KEY not in render_context:
+            render_context[SLOT_CONTEXT_KEY] = SlotContext()
+        self.slot_context = render_context[SLOT_CONTEXT_KEY]
+        self.slot_context.add_slots(self.node.slots, layout)
+
+        # Like render_context.push_state(template, isolated_context=False),
+        # which is a generator.
+        self.initial, render_context.template = render_context.template, self.template
+        if self.values is None:
+            return self.context
+        if self.node.isolated_context:
+            return isolate_context(self.context, self.values)
+        self.context.push(**self.values)
+        return self.context
+
+    def __exit__(self, *exc_info):
+        if self.values is not None and not self.node.isolated_context:
+            self.context.pop()
+        self.context.render_context.template = self.initial
+        self.slot_context.remove_slots(self.node.slots)
 
 
 class ComponentNode(Node):
+    # Every attribute is a slot, including the token and origin the parser
+    # sets, so nodes never get an instance dict.
+    __slots__ = (
+        'extra_context', 'isolated_context', 'nodelist', 'parent_name', 'literal_parent', 'slots',
+        'cache_timeout', 'vary_on', 'dedupe', 'slots_fingerprint', 'token', 'origin',
+    )
     context_key = 'component_context'
 
-    def __init__(self, nodelist, parent_name, extra_context=None, isolated_context=False):
-        self.extra_context = extra_context
+    def __init__(self, nodelist, parent_name, extra_context=None, isolated_context=False,
+                 cache_timeout=None, vary_on=(), dedupe=False):
+        self.extra_context = extra_context or EMPTY_MAPPING
         self.isolated_context = isolated_context
         self.nodelist = nodelist
         self.parent_name = parent_name
+        # Literal names can be cached for good, variable ones only in the LRU.
+        self.literal_parent = not (parent_name.filters or isinstance(parent_name.var, Variable))
         # self.template_dirs = template_dirs
-        self.slots = {n.name: n for n in nodelist.get_nodes_by_type(SlotNode)}
+        # Only top-level slots are overrides; slots nested in them belong to the
+        # template this component is used in.
+        self.slots = {n.name: n for n in nodelist if isinstance(n, SlotNode)} or EMPTY_MAPPING
+        self.cache_timeout = cache_timeout
+        self.vary_on = vary_on
+        self.dedupe = dedupe
+        self.slots_fingerprint = None
+        if cache_timeout is not None:
+            self.slots_fingerprint = nodelist_fingerprint(self.slots.values())
 
     def __repr__(self):
         return '<Component Node: %s %s>' % (self.__class__.__name__, self.parent_name.token)
 
     def find_template(self, template_name, context):
-        template, origin = context.template.engine.find_template(
-            template_name
-        )
-        return template
+        cache = get_template_cache(context.template.engine)
+        return cache.get_template(template_name, literal=self.literal_parent)
 
     def get_parent(self, context):
         parent = self.parent_name.resolve(context)
@@ -69,71 +234,416 @@ class ComponentNode(Node):
             return parent.template
         return self.find_template(parent, context)
 
+    def get_cache_key(self, compiled_parent, context):
+        origin = compiled_parent.origin
+        fragment_name = 'component.%s.%s' % (origin.template_name or origin.name, self.slots_fingerprint)
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        # The overrides of the components around this one render into its
+        # output too.
+        slot_context = context.render_context.get(SLOT_CONTEXT_KEY)
+        if slot_context is not None:
+            for name in sorted(slot_context.slots):
+                vary_on.append(name)
+                vary_on.extend(get_slot_fingerprint(slot) for slot in slot_context.slots[name])
+        return make_template_fragment_key(fragment_name, vary_on)
+
     def render(self, context):
         compiled_parent = self.get_parent(context)
+        if stats.enabled:
+            origin = compiled_parent.origin
+            return stats.measure('component', origin.template_name or origin.name,
+                                 self.render_component, compiled_parent, context)
+        return self.render_component(compiled_parent, context)
 
-        if SLOT_CONTEXT_KEY not in context.render_context:
-            context.render_context[SLOT_CONTEXT_KEY] = SlotContext()
-        slot_context = context.render_context[SLOT_CONTEXT_KEY]
+    def render_component(self, compiled_parent, context):
+        if self.dedupe:
+            return self.render_deduped(compiled_parent, context)
+        if self.cache_timeout is not None:
+            return self.render_cached(compiled_parent, context)
+        return self.render_parent(compiled_parent, context)
 
-        # Add the block nodes from this node to the block context
-        slot_context.add_slots(self.slots)
+    def get_dedupe_key(self, compiled_parent, context, values):
+        slot_context = context.render_context.get(SLOT_CONTEXT_KEY)
+        # Slots this component doesn't override may still be overridden by
+        # the components around it.
+        overrides = frozenset(
+            (name, stack[-1]) for name, stack in slot_context.slots.items()
+        ) if slot_context is not None else frozenset()
+        key = (compiled_parent, context.autoescape, context.use_l10n, context.use_tz,
+               tuple(sorted(values.items())), tuple(self.slots.values()), overrides)
+        try:
+            hash(key)
+        except TypeError:  # unhashable argument, render as usual
+            return None
+        return key
 
-        # If this block's parent doesn't have an extends node it is the root,
-        # # and its block nodes also need to be added to the block context.
-        for node in compiled_parent.nodelist:
-            # The ExtendsNode has to be the first non-text node.
-            if isinstance(node, ExtendsNode):
-                raise TemplateSyntaxError("%s must not extend another template" % (self))
+    def get_dedupe_memo(self, context):
+        # The bottom of the render context lasts for the whole render, also
+        # across includes, and is thrown away with it.
+        return context.render_context.dicts[0].setdefault(DEDUPE_CONTEXT_KEY, {})
 
-        # Call Template._render explicitly so the parser context stays
-        # the same.
-        values = {
+    def render_deduped(self, compiled_parent, context):
+        values = self.resolve_values(context)
+        key = self.get_dedupe_key(compiled_parent, context, values)
+        if key is None:
+            return self.render_parent(compiled_parent, context, values)
+        memo = self.get_dedupe_memo(context)
+        output = memo.get(key)
+        if output is None:
+            if self.cache_timeout is not None:
+                output = self.render_cached(compiled_parent, context, values)
+            else:
+                output = self.render_parent(compiled_parent, context, values)
+            memo[key] = output
+        return output
+
+    def get_cache(self, compiled_parent, context):
+        """
+        Return the cache, key and timeout for storing this component's output.
+        """
+        try:
+            timeout = self.cache_timeout.resolve(context)
+        except VariableDoesNotExist:
+            raise TemplateSyntaxError('"component" tag got an unknown variable: %r' % self.cache_timeout.var)
+        if timeout is not None:
+            try:
+                timeout = int(timeout)
+            except (ValueError, TypeError):
+                raise TemplateSyntaxError('"component" tag got a non-integer timeout value: %r' % timeout)
+        cache = caches[getattr(settings, 'MIXIN_TEMPLATETAG_CACHE_ALIAS', 'default')]
+        return cache, self.get_cache_key(compiled_parent, context), timeout
+
+    def render_cached(self, compiled_parent, context, values=None):
+        cache, key, timeout = self.get_cache(compiled_parent, context)
+        output = cache.get(key)
+        if output is None:
+            output = self.render_parent(compiled_parent, context, values)
+            cache.set(key, output, timeout)
+        return mark_safe(output)
+
+    def resolve_values(self, context):
+        return {
             name: var.resolve(context)
             for name, var in self.extra_context.items()
         }
 
-        with context.render_context.push_state(compiled_parent, isolated_context=False):
-            if self.isolated_context:
-                return compiled_parent._render(context.new(values))
-            with context.push(**values):
-                return compiled_parent._render(context)
+    def render_parent(self, compiled_parent, context, values=None):
+        if values is None:
+            values = self.resolve_values(context)
+        if compiler.enabled:
+            render = compiler.get_compiled(compiled_parent.nodelist, context.template.engine.debug)
+        else:
+            # Call Template._render explicitly so the parser context stays
+            # the same.
+            render = compiled_parent._render
+        with ComponentScope(self, compiled_parent, context, values) as context:
+            return render(context)
+
+    def render_iter(self, context):
+        compiled_parent = self.get_parent(context)
+        if self.cache_timeout is not None or self.dedupe:
+            yield self.render_component(compiled_parent, context)
+            return
+        with ComponentScope(self, compiled_parent, context, self.resolve_values(context)) as context:
+            yield from iter_nodelist(compiled_parent.nodelist, context)
+
+    async def arender(self, context):
+        return await self.arender_resolved(context, await self.aresolve(context))
+
+    async def aresolve(self, context):
+        return self.get_parent(context), await aresolve_values(self.extra_context, context)
+
+    async def arender_resolved(self, context, resolved):
+        compiled_parent, values = resolved
+        if not self.dedupe:
+            return await self.arender_cached(compiled_parent, context, values)
+        key = self.get_dedupe_key(compiled_parent, context, values)
+        if key is None:
+            return await self.arender_parent(compiled_parent, context, values)
+        memo = self.get_dedupe_memo(context)
+        output = memo.get(key)
+        if output is None:
+            output = memo[key] = await self.arender_cached(compiled_parent, context, values)
+        return output
+
+    async def arender_cached(self, compiled_parent, context, values):
+        if self.cache_timeout is None:
+            return await self.arender_parent(compiled_parent, context, values)
+        cache, key, timeout = self.get_cache(compiled_parent, context)
+        output = cache.get(key)
+        if output is None:
+            output = await self.arender_parent(compiled_parent, context, values)
+            cache.set(key, output, timeout)
+        return mark_safe(output)
+
+    async def arender_parent(self, compiled_parent, context, values):
+        with ComponentScope(self, compiled_parent, context, values) as context:
+            return await arender_nodelist(compiled_parent.nodelist, context)
+
+
+def uses_variables(filter_expression, names):
+    """
+    Return whether ``filter_expression`` or any of its filter arguments looks
+    up one of ``names``.
+    """
+    variables = [filter_expression.var]
+    for func, args in filter_expression.filters:
+        variables.extend(arg for lookup, arg in args)
+    return any(
+        isinstance(var, Variable) and var.lookups is not None and var.lookups[0] in names
+        for var in variables
+    )
+
+
+class ComponentForNode(ComponentNode):
+    __slots__ = ('loopvars', 'sequence', 'loop_context', 'static_context')
+
+    def __init__(self, loopvars, sequence, nodelist, parent_name, extra_context=None, isolated_context=False):
+        super().__init__(nodelist, parent_name, extra_context=extra_context, isolated_context=isolated_context)
+        self.loopvars, self.sequence = loopvars, sequence
+        # Arguments using a loop variable are resolved for each item, the
+        # rest once per loop.
+        names = set(loopvars) | {'forloop'}
+        self.loop_context = {
+            name: var for name, var in self.extra_context.items() if uses_variables(var, names)
+        } or EMPTY_MAPPING
+        self.static_context = {
+            name: var for name, var in self.extra_context.items() if name not in self.loop_context
+        } or EMPTY_MAPPING
+
+    def __repr__(self):
+        return '<Component For Node: %s in %s %s>' % (
+            ', '.join(self.loopvars), self.sequence, self.parent_name.token,
+        )
+
+    def set_loopvars(self, context, item):
+        # Mirrors ForNode.render, setting them in the dict pushed for the loop.
+        if len(self.loopvars) == 1:
+            context[self.loopvars[0]] = item
+            return
+        try:
+            len_item = len(item)
+        except TypeError:  # not an iterable
+            len_item = 1
+        if len(self.loopvars) != len_item:
+            raise ValueError(
+                'Need {} values to unpack in for loop; got {}. '.format(len(self.loopvars), len_item),
+            )
+        for name, value in zip(self.loopvars, item):
+            context[name] = value
+
+    def render_component(self, compiled_parent, context):
+        # Mirrors ForNode.render.
+        parentloop = context['forloop'] if 'forloop' in context else {}
+        values = self.sequence.resolve(context, ignore_failures=True)
+        if values is None:
+            values = []
+        if not hasattr(values, '__len__'):
+            values = list(values)
+        len_values = len(values)
+        if len_values < 1:
+            return ''
+
+        static_values = {
+            name: var.resolve(context)
+            for name, var in self.static_context.items()
+        }
+
+        if compiler.enabled:
+            render = compiler.get_compiled(compiled_parent.nodelist, context.template.engine.debug)
+        else:
+            render = compiled_parent._render
+
+        bits = []
+        scope = ComponentScope(self, compiled_parent, context)
+        with scope, context.push(**static_values):
+            loop_dict = context['forloop'] = {'parentloop': parentloop}
+            for i, item in enumerate(values):
+                scope.slot_context.clear_outputs()
+                loop_dict['counter0'] = i
+                loop_dict['counter'] = i + 1
+                loop_dict['revcounter'] = len_values - i
+                loop_dict['revcounter0'] = len_values - i - 1
+                loop_dict['first'] = i == 0
+                loop_dict['last'] = i == len_values - 1
+                self.set_loopvars(context, item)
+
+                loop_values = {
+                    name: var.resolve(context)
+                    for name, var in self.loop_context.items()
+                }
+                if self.isolated_context:
+                    # Like a component inside a for loop: nothing but the
+                    # arguments, without the loop variables or forloop.
+                    loop_values.update(static_values)
+                    bits.append(render(isolate_context(context, loop_values)))
+                else:
+                    with context.push(**loop_values):
+                        bits.append(render(context))
+        return mark_safe(''.join(bits))
+
+    def render_iter(self, context):
+        yield self.render(context)
+
+    async def aresolve(self, context):
+        return None
+
+    async def arender_resolved(self, context, resolved):
+        return self.render(context)
+
+
+class SlotHandle:
+    """
+    What ``{{ slot }}`` refers to while a slot renders. A new one is made for
+    each render, so the shared nodes never hold any render state.
+    """
+    __slots__ = ('node', 'slot', 'context')
+
+    def __init__(self, node, slot, context):
+        # node is the slot in the component template, slot is what it renders:
+        # either an override or node itself.
+        self.node, self.slot, self.context = node, slot, context
+
+    @property
+    def name(self):
+        return self.node.name
+
+    def super(self):
+        if self.slot is self.node:
+            return ''
+        slot_context = self.context.render_context[SLOT_CONTEXT_KEY]
+        # The override being rendered is off its stack, so this renders the
+        # next one down or, failing that, the component's default.
+        return mark_safe(self.node.render_slot(self.context, slot_context))
+
+
+def uses_slot_super(nodelist):
+    return any(
+        'slot.super' in getattr(getattr(node, 'token', None), 'contents', '')
+        for node in nodelist.get_nodes_by_type(Node)
+    )
 
 
 class SlotNode(Node):
-    def __init__(self, name, nodelist, parent=None):
+    # mixin_fingerprint is only set once a cached component needs it.
+    __slots__ = ('name', 'nodelist', 'parent', 'rerender', 'memoize', 'static', 'mixin_fingerprint', 'token', 'origin')
+
+    def __init__(self, name, nodelist, parent=None, rerender=False):
         self.name, self.nodelist, self.parent = name, nodelist, parent
+        self.rerender = rerender
+        # Whether this slot's output can be reused when it overrides a slot
+        # that's referenced more than once.
+        self.memoize = not rerender and not uses_slot_super(nodelist)
+        # The output of a slot that is nothing but text, rendered without
+        # touching the context.
+        self.static = static_output(nodelist)
 
     def __repr__(self):
         return "<Slot Node: %s. Contents: %r>" % (self.name, self.nodelist)
 
     def render(self, context):
+        if stats.enabled:
+            return stats.measure('slot', self.name, self.render_contents, context)
+        return self.render_contents(context)
+
+    def render_contents(self, context):
         slot_context = context.render_context.get(SLOT_CONTEXT_KEY)
-        with context.push():
-            if slot_context is None:
-                context['slot'] = self
-                result = self.nodelist.render(context)
-            else:
-                slot = slot_context.pop(self.name)
-                if slot is None:
-                    slot = self
-                # Create new block so we can store context without thread-safety issues.
-                slot = type(self)(slot.name, slot.nodelist)
-                slot.context = context
-                context['slot'] = slot
-                result = slot.nodelist.render(context)
-                # if push is not None:
-                #     slot_context.push(self.name, push)
-        return result
+        if slot_context is None:
+            if self.static is not None:
+                return self.static
+            with context.push(slot=self):
+                return self.nodelist.render(context)
+        return self.render_slot(context, slot_context)
+
+    def get_static(self, slot_context):
+        # The output of the slot that renders here, if it's static.
+        override = slot_context.get_slot(self.name)
+        return (self if override is None else override).static
+
+    def select_slot(self, slot_context):
+        """
+        Return the override of this slot, or None; the slot that renders
+        here, which is the override or this node; and the rendered overrides
+        of the innermost component its output is kept in, or None. The
+        override is taken off its stack while it renders, so slots of the
+        same name inside it see the next one down: push it back when done.
+        """
+        override = slot_context.pop(self.name)
+        slot = self if override is None else override
+        return override, slot, slot_context.get_outputs(self, slot)
+
+    def render_slot(self, context, slot_context):
+        static = self.get_static(slot_context)
+        if static is not None:
+            return static
+        override, slot, outputs = self.select_slot(slot_context)
+        try:
+            if outputs is not None and slot in outputs:
+                return outputs[slot]
+            with context.push(slot=SlotHandle(self, slot, context)):
+                output = slot.nodelist.render(context)
+            if outputs is not None:
+                outputs[slot] = output
+            return output
+        finally:
+            if override is not None:
+                slot_context.push(self.name, override)
+
+    def render_iter(self, context):
+        slot_context = context.render_context.get(SLOT_CONTEXT_KEY)
+        static = self.static if slot_context is None else self.get_static(slot_context)
+        if static is not None:
+            yield static
+            return
+        if slot_context is None:
+            with context.push(slot=self):
+                yield from iter_nodelist(self.nodelist, context)
+            return
+        override, slot, outputs = self.select_slot(slot_context)
+        try:
+            if outputs is not None and slot in outputs:
+                yield outputs[slot]
+                return
+            chunks = []
+            with context.push(slot=SlotHandle(self, slot, context)):
+                for chunk in iter_nodelist(slot.nodelist, context):
+                    chunks.append(chunk)
+                    yield chunk
+            if outputs is not None:
+                outputs[slot] = mark_safe(''.join(chunks))
+        finally:
+            if override is not None:
+                slot_context.push(self.name, override)
+
+    async def arender(self, context):
+        return await self.arender_resolved(context, None)
+
+    async def aresolve(self, context):
+        return None
+
+    async def arender_resolved(self, context, resolved):
+        slot_context = context.render_context.get(SLOT_CONTEXT_KEY)
+        static = self.static if slot_context is None else self.get_static(slot_context)
+        if static is not None:
+            return static
+        if slot_context is None:
+            with context.push(slot=self):
+                return await arender_nodelist(self.nodelist, context)
+        override, slot, outputs = self.select_slot(slot_context)
+        try:
+            if outputs is not None and slot in outputs:
+                return outputs[slot]
+            with context.push(slot=SlotHandle(self, slot, context)):
+                output = await arender_nodelist(slot.nodelist, context)
+            if outputs is not None:
+                outputs[slot] = output
+            return output
+        finally:
+            if override is not None:
+                slot_context.push(self.name, override)
 
     def super(self):
-        if not hasattr(self, 'context'):
-            raise TemplateSyntaxError(
-                "'%s' object has no attribute 'context'. Did you use "
-                "{{ slot.super }} in a base template?" % self.__class__.__name__
-            )
-        render_context = self.context.render_context
-        if (SLOT_CONTEXT_KEY in render_context and
-                render_context[SLOT_CONTEXT_KEY].get_slot(self.name) is not None):
-            return mark_safe(self.render(self.context))
-        return ''
+        raise TemplateSyntaxError(
+            "'%s' object has no attribute 'context'. Did you use "
+            "{{ slot.super }} in a base template?" % self.__class__.__name__
+        )
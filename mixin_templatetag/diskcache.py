@@ -0,0 +1,300 @@
+"""
+A persistent cache of compiled component templates and mixin libraries.
+
+With ``MIXIN_TEMPLATETAG_DISK_CACHE_DIR`` set, the component caches load each
+template they need from that directory instead of parsing it, and write every
+template they do parse there, so new processes start with the templates their
+predecessors compiled.
+
+Entries are keyed by a hash of the template's source and name, the Django and
+package versions, the engine options that change how templates compile, the
+source of the engine's tag libraries and ``MIXIN_TEMPLATETAG_DISK_CACHE_VERSION``,
+so an edited template, an upgrade or a deploy changing tag code simply misses.
+Tags whose nodes live outside of their library module need the version setting
+changed when those nodes change. Mixins taken from libraries are stored as
+references, and the libraries are checked to be unchanged before an entry is
+used. Functions made by the nodelist compiler and component layouts aren't
+stored; they're made again on first use.
+
+Entries are loaded with pickle, so whoever can write to the directory can run
+code in the processes using it: it must only be writable by the application.
+"""
+import copyreg
+import gc
+import hashlib
+import io
+import logging
+import os
+import pickle
+import sys
+import tempfile
+from weakref import WeakKeyDictionary
+
+import django
+from django.conf import settings
+from django.template import Engine, Template, TemplateDoesNotExist, smartif
+from django.template.base import NodeList, Origin
+
+import mixin_templatetag
+from mixin_templatetag.templatecache import COMPONENT, MIXINS
+from mixin_templatetag.utils import EMPTY_MAPPING, EMPTY_NODELIST
+
+logger = logging.getLogger('mixin_templatetag')
+
+# Changes whenever what's stored changes.
+CACHE_VERSION = 1
+
+# Digests of the tag libraries of each engine, worked out once.
+_code_keys = WeakKeyDictionary()
+
+# Errors unpickling an entry written by another version of some code.
+LOAD_ERRORS = (pickle.UnpicklingError, EOFError, AttributeError, ImportError, IndexError, KeyError, TypeError,
+               ValueError, TemplateDoesNotExist)
+# Errors pickling templates with tags that hold unpicklable values.
+DUMP_ERRORS = (pickle.PicklingError, AttributeError, TypeError, RecursionError)
+
+
+def make_operator(operator_id, state):
+    operator = smartif.OPERATORS[operator_id]()
+    operator.__dict__.update(state)
+    return operator
+
+
+def reduce_operator(operator):
+    # The if tag's operators are classes made by a function, so they can only
+    # be found again through their id.
+    return make_operator, (operator.id, operator.__dict__)
+
+
+def reduce_template(template):
+    state = dict(template.__dict__)
+    state.pop('mixin_component_layout', None)
+    return copyreg.__newobj__, (Template,), state
+
+
+def reduce_nodelist(nodelist):
+    state = dict(nodelist.__dict__)
+    state.pop('mixin_compiled', None)
+    return NodeList, (), state or None, iter(nodelist)
+
+
+# The types of the objects stored as references to the loading process's own.
+PERSISTENT_TYPES = frozenset((Engine, type(EMPTY_MAPPING), NodeList, Origin))
+
+DISPATCH_TABLE = copyreg.dispatch_table.copy()
+DISPATCH_TABLE.update({
+    Template: reduce_template,
+    NodeList: reduce_nodelist,
+})
+DISPATCH_TABLE.update((operator, reduce_operator) for operator in smartif.OPERATORS.values())
+
+
+class TemplatePickler(pickle.Pickler):
+    """
+    Pickles a compiled template, leaving out the engine, origins and mixins
+    of libraries, which are looked up again when it's loaded.
+    """
+    dispatch_table = DISPATCH_TABLE
+
+    def __init__(self, file, engine, mixins):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.engine = engine
+        # Library nodelists by id, mapped to their library and mixin names.
+        self.mixins = mixins
+
+    def persistent_id(self, obj):
+        # Called for every object pickled, so most leave on the first check.
+        if type(obj) not in PERSISTENT_TYPES:
+            return None
+        if obj is self.engine:
+            return ('engine',)
+        if obj is EMPTY_MAPPING:
+            return ('empty_mapping',)
+        if obj is EMPTY_NODELIST:
+            return ('empty_nodelist',)
+        if type(obj) is Origin:
+            return ('origin', obj.name, obj.template_name)
+        if type(obj) is NodeList and id(obj) in self.mixins:
+            return ('mixin',) + self.mixins[id(obj)]
+        return None
+
+
+class TemplateUnpickler(pickle.Unpickler):
+    def __init__(self, file, cache, origin):
+        super().__init__(file)
+        self.cache, self.origin = cache, origin
+
+    def persistent_load(self, pid):
+        kind = pid[0]
+        if kind == 'engine':
+            return self.cache.engine
+        if kind == 'empty_mapping':
+            return EMPTY_MAPPING
+        if kind == 'empty_nodelist':
+            return EMPTY_NODELIST
+        if kind == 'origin':
+            if pid[1] == self.origin.name:
+                return self.origin
+            return Origin(pid[1], pid[2])
+        if kind == 'mixin':
+            return self.cache.get_mixin_library(pid[1])[pid[2]]
+        raise pickle.UnpicklingError('Unknown persistent id %r.' % (pid,))
+
+
+def find_source(engine, template_name):
+    """
+    Return the source and origin of the template ``engine`` would load for
+    ``template_name``, without compiling it.
+    """
+    for loader in engine.template_loaders:
+        for origin in loader.get_template_sources(template_name):
+            try:
+                return loader.get_contents(origin), origin
+            except TemplateDoesNotExist:
+                continue
+    raise TemplateDoesNotExist(template_name)
+
+
+def get_code_key(engine):
+    """
+    Return a digest of the source of the tag library modules ``engine`` uses,
+    so entries pickled with other tag code miss.
+    """
+    try:
+        return _code_keys[engine]
+    except KeyError:
+        pass
+    digest = hashlib.sha256()
+    for path in sorted(set(engine.libraries.values()) | set(engine.builtins)):
+        digest.update(path.encode())
+        digest.update(b'\0')
+        filename = getattr(sys.modules.get(path), '__file__', None)
+        if filename:
+            try:
+                with open(filename, 'rb') as fp:
+                    digest.update(fp.read())
+            except OSError:
+                pass
+    # Threads racing here work out the same digest.
+    key = _code_keys[engine] = digest.hexdigest()
+    return key
+
+
+def get_key(engine, origin, source):
+    digest = hashlib.sha256()
+    for bit in (
+        CACHE_VERSION, django.get_version(), mixin_templatetag.__version__, engine.debug,
+        sorted(engine.libraries.items()), engine.builtins, get_code_key(engine),
+        getattr(settings, 'MIXIN_TEMPLATETAG_DISK_CACHE_VERSION', None),
+        getattr(settings, 'MIXIN_TEMPLATETAG_COLLAPSE_WHITESPACE', False),
+        origin.name, origin.template_name, source,
+    ):
+        digest.update(repr(bit).encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def get_library_key(engine, template_name):
+    try:
+        source, origin = find_source(engine, template_name)
+    except TemplateDoesNotExist:
+        return None
+    return get_key(engine, origin, source)
+
+
+def get_compiled_template(engine, template_name):
+    # A template the engine's cached loader already compiled.
+    for loader in engine.template_loaders:
+        template = getattr(loader, 'get_template_cache', {}).get(template_name)
+        if isinstance(template, Template):
+            return template
+    return None
+
+
+def read_template(cache, origin, path):
+    """
+    Return the template stored at ``path``, or None if there's none or the
+    mixin libraries it uses have changed.
+    """
+    try:
+        with open(path, 'rb') as fp:
+            # Unpickling from memory is much faster than from the file.
+            fp = io.BytesIO(fp.read())
+    except OSError:
+        return None
+    try:
+        dependencies, libraries = pickle.load(fp)
+        for library, key in libraries.items():
+            if get_library_key(cache.engine, library) != key:
+                return None
+        # Unpickling makes thousands of objects in a burst, and the garbage
+        # collections they trigger cost more than the unpickling itself.
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            template = TemplateUnpickler(fp, cache, origin).load()
+        finally:
+            if gc_enabled:
+                gc.enable()
+    except LOAD_ERRORS as e:
+        logger.debug("Ignoring the cached template %r: %r", origin.template_name, e)
+        return None
+    # Parsing records what the template uses; loading it has to as well.
+    for kind, names in dependencies.items():
+        for name in names:
+            cache.add_dependency(origin.template_name, kind, name)
+    return template
+
+
+def write_template(cache, template, directory, path):
+    """
+    Store ``template`` at ``path``. The file is written under another name and
+    moved into place, so readers never see a partial entry.
+    """
+    engine, name = cache.engine, template.origin.template_name
+    dependencies = {kind: sorted(cache.get_dependencies(name, kind)) for kind in (COMPONENT, MIXINS)}
+    libraries, mixins = {}, {}
+    for library in dependencies[MIXINS]:
+        libraries[library] = get_library_key(engine, library)
+        for mixin_name, nodelist in cache.get_mixin_library(library).items():
+            mixins[id(nodelist)] = (library, mixin_name)
+    try:
+        # Only this user may write entries, since loading one can run code.
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    except OSError as e:
+        logger.warning("Can't write to the template cache in %r: %s", directory, e)
+        return
+    try:
+        with os.fdopen(fd, 'wb') as fp:
+            pickle.dump((dependencies, libraries), fp, pickle.HIGHEST_PROTOCOL)
+            TemplatePickler(fp, engine, mixins).dump(template)
+        os.replace(temp_path, path)
+    except DUMP_ERRORS + (OSError,) as e:
+        logger.debug("Can't cache the template %r: %r", name, e)
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+
+
+def load_template(cache, template_name, directory):
+    """
+    Return the compiled ``template_name`` for the engine of ``cache``, loading
+    it from ``directory`` if it's stored there and storing it otherwise.
+    """
+    engine = cache.engine
+    template = get_compiled_template(engine, template_name)
+    if template is not None:
+        return template
+    try:
+        source, origin = find_source(engine, template_name)
+    except TemplateDoesNotExist:
+        # Raise the error the engine would, with the origins it tried.
+        return engine.find_template(template_name)[0]
+    path = os.path.join(directory, get_key(engine, origin, source) + '.pickle')
+    template = read_template(cache, origin, path)
+    if template is None:
+        template = Template(source, origin, origin.template_name, engine)
+        write_template(cache, template, directory, path)
+    return template
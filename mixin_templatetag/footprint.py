@@ -0,0 +1,120 @@
+"""
+Report the memory held by the mixin and component structures of compiled
+templates.
+
+:func:`template_footprint` counts the mixin, mix, component and slot nodes of
+a template and the bytes they hold: the nodes themselves, their attributes
+and the containers they own, but not the other nodes they point to, which
+are counted on their own. Objects shared between nodes, like the empty
+mapping of components without slot overrides, are only counted once per
+template. :func:`engine_footprint` does the same for every template an
+engine's cached loaders and the component caches hold, and the
+``precompile_templates`` command prints it with ``--memory``.
+"""
+import sys
+from enum import Enum
+from types import FunctionType, MethodType, ModuleType
+
+from django.template import Node, Template
+from django.template.base import NodeList, Origin
+
+from mixin_templatetag.componentnodes import ComponentNode, SlotNode
+from mixin_templatetag.mixinnodes import LoadMixinsNode, MixinNode, MixNode
+from mixin_templatetag.templatecache import get_template_cache
+
+NODE_TYPES = (MixinNode, LoadMixinsNode, MixNode, ComponentNode, SlotNode)
+
+# Objects owned by the template or shared by the whole process.
+NOT_OWNED = (Node, NodeList, Template, Origin, Enum, bool, type, FunctionType, MethodType, ModuleType)
+
+
+def sizeof(obj, seen):
+    """
+    Return the size of ``obj`` and of everything it refers to that hasn't
+    been counted yet, stopping at other nodes and templates.
+    """
+    if obj is None or id(obj) in seen or isinstance(obj, NOT_OWNED):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, int, float)):
+        return size
+    if hasattr(obj, 'items'):
+        return size + sum(sizeof(key, seen) + sizeof(value, seen) for key, value in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return size + sum(sizeof(item, seen) for item in obj)
+    # Reading __dict__ creates it on Python 3.11+, so it's only read for
+    # classes that keep their attributes there.
+    if '__slots__' not in type(obj).__dict__ and hasattr(obj, '__dict__'):
+        size += sizeof(obj.__dict__, seen)
+    return size + sum(sizeof(value, seen) for value in slot_values(obj))
+
+
+def slot_values(obj):
+    for cls in type(obj).__mro__:
+        for attr in cls.__dict__.get('__slots__', ()):
+            yield getattr(obj, attr, None)
+
+
+def node_sizeof(node, seen):
+    # The node itself isn't owned by anything else. Its attributes are all
+    # slots.
+    seen.add(id(node))
+    return sys.getsizeof(node) + sum(sizeof(value, seen) for value in slot_values(node))
+
+
+def template_footprint(template):
+    """
+    Return a dict with the number of mixin, mix, component and slot nodes of
+    ``template``, the bytes they hold by node type and in ``total``.
+    """
+    seen = set()
+    counts, sizes = {}, {}
+    for node_type in NODE_TYPES:
+        for node in template.nodelist.get_nodes_by_type(node_type):
+            if id(node) in seen:
+                continue
+            name = type(node).__name__
+            counts[name] = counts.get(name, 0) + 1
+            sizes[name] = sizes.get(name, 0) + node_sizeof(node, seen)
+    layout = getattr(template, 'mixin_component_layout', None)
+    if layout is not None:
+        counts['ComponentLayout'] = 1
+        sizes['ComponentLayout'] = sizeof(layout, seen)
+    return {
+        'nodes': sum(count for name, count in counts.items() if name != 'ComponentLayout'),
+        'counts': counts,
+        'sizes': sizes,
+        'total': sum(sizes.values()),
+    }
+
+
+def iter_cached_templates(engine):
+    """
+    Yield the name and template of each template compiled by ``engine`` that
+    is held by its cached loaders or the component caches.
+    """
+    seen = set()
+    for loader in engine.template_loaders:
+        for template in list(getattr(loader, 'get_template_cache', {}).values()):
+            if isinstance(template, Template) and id(template) not in seen:
+                seen.add(id(template))
+                yield template.origin.template_name or template.origin.name, template
+    cache = get_template_cache(engine)
+    for name, template in list(cache.templates.items()):
+        if id(template) not in seen:
+            seen.add(id(template))
+            yield name, template
+
+
+def engine_footprint(engine):
+    """
+    Return ``(template name, footprint)`` pairs for the templates compiled by
+    ``engine`` that use mixins or components, the largest first.
+    """
+    footprints = [
+        (name, template_footprint(template))
+        for name, template in iter_cached_templates(engine)
+    ]
+    footprints = [(name, footprint) for name, footprint in footprints if footprint['total']]
+    return sorted(footprints, key=lambda item: item[1]['total'], reverse=True)
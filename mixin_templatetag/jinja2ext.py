@@ -0,0 +1,310 @@
+"""
+The mixin, mix, component and slot tags for Jinja2.
+
+Add the extension to a Jinja2 environment, e.g. in Django's ``TEMPLATES``::
+
+    {
+        'BACKEND': 'django.template.backends.jinja2.Jinja2',
+        'OPTIONS': {'extensions': ['mixin_templatetag.jinja2ext.mixins']},
+    }
+
+The tags take the same arguments as their Django counterparts, with Jinja2
+expressions as values. Everything is compiled into the template's own code:
+
+* A mix is replaced by a copy of the mixin's body, in a ``with`` scope
+  holding its arguments or, with ``only``, in a scope that sees nothing but
+  its arguments and the environment's globals.
+* Slot contents, both the defaults in a component template and the overrides
+  inside ``component``, become blocks of the template they are written in,
+  hidden under a name of their own. Rendering a slot calls the block of the
+  innermost override, or of the default, with the context at the slot.
+
+Only synchronous environments are supported.
+"""
+import hashlib
+from copy import deepcopy
+
+from jinja2 import nodes
+from jinja2.exceptions import TemplateRuntimeError, TemplateSyntaxError
+from jinja2.ext import Extension
+from jinja2.runtime import missing
+from markupsafe import Markup
+
+# Holds the slot overrides of the components being rendered in the context.
+# It isn't a valid identifier, so templates can't refer to it.
+SLOTS_KEY = 'mixin_templatetag.slots'
+BLOCK_PREFIX = 'mixin_slot_'
+
+
+class ParseState:
+    """
+    What the extension keeps on a parser while it parses one template.
+    """
+
+    def __init__(self, name):
+        self.mixins = {}
+        self.prefix = '%s%s_' % (BLOCK_PREFIX, hashlib.md5((name or '').encode()).hexdigest()[:8])
+        self.blocks = 0
+
+    def new_block_name(self):
+        self.blocks += 1
+        return '%s%d' % (self.prefix, self.blocks)
+
+
+class IsolatedVars(dict):
+    """
+    Variables of an ``only`` mix. Everything else the context would find is
+    hidden, except the environment's globals.
+    """
+    __slots__ = ('globals',)
+
+    def __init__(self, values, globals):
+        super().__init__(values)
+        self.globals = globals
+
+    def __contains__(self, key):
+        return True
+
+    def __missing__(self, key):
+        return self.globals.get(key, missing)
+
+
+class SlotHandle:
+    """
+    What ``{{ slot }}`` refers to while a slot renders.
+    """
+    __slots__ = ('extension', 'context', 'name', 'overrides', 'default')
+
+    def __init__(self, extension, context, name, overrides, default):
+        # overrides is None when there's no component rendering, and is
+        # otherwise what's left of the stack below the slot being rendered.
+        self.extension, self.context, self.name = extension, context, name
+        self.overrides, self.default = overrides, default
+
+    @property
+    def super(self):
+        if self.overrides is None:
+            raise TemplateRuntimeError(
+                "{{ slot.super }} can only be used in a template rendered as a component."
+            )
+        if self.overrides is False:  # the default is rendering
+            return Markup('')
+        return self.extension.render_slot(self.context, self.name, self.overrides, self.default)
+
+
+class MixinExtension(Extension):
+    tags = {'mixin', 'mix', 'component', 'slot'}
+
+    def get_state(self, parser):
+        state = getattr(parser, 'mixin_templatetag_state', None)
+        if state is None:
+            state = parser.mixin_templatetag_state = ParseState(parser.name)
+        return state
+
+    def parse(self, parser):
+        tag = next(parser.stream)
+        return getattr(self, 'parse_%s' % tag.value)(parser, tag)
+
+    def parse_end(self, parser, end_tag, name):
+        # Like Django, the end tag may repeat the name.
+        if parser.stream.current.type == 'name':
+            end_name = next(parser.stream)
+            if end_name.value != name:
+                parser.fail('%r tag for %r closed with %r.' % (end_tag, name, end_name.value), end_name.lineno)
+
+    def parse_options(self, parser, tag):
+        values = []
+        options = set()
+        stream = parser.stream
+        while stream.current.type != 'block_end':
+            option = stream.expect('name')
+            if option.value in options:
+                parser.fail('The %r option was specified more than once.' % option.value, option.lineno)
+            options.add(option.value)
+            if option.value == 'with':
+                while stream.current.type == 'name' and stream.look().type == 'assign':
+                    key = next(stream).value
+                    next(stream)
+                    values.append((key, parser.parse_expression()))
+                if not values:
+                    parser.fail('"with" in %r tag needs at least one keyword argument.' % tag.value, option.lineno)
+            elif option.value != 'only':
+                parser.fail('Unknown argument for %r tag: %r.' % (tag.value, option.value), option.lineno)
+        return values, 'only' in options
+
+    def hidden_blocks(self, blocks, lineno):
+        # Blocks are compiled into render functions wherever they are, so
+        # they can be called by name without ever rendering in place.
+        return nodes.If(nodes.Const(False), blocks, [], [], lineno=lineno)
+
+    def parse_mixin(self, parser, tag):
+        name = parser.stream.expect('name').value
+        body = parser.parse_statements(('name:endmixin',), drop_needle=True)
+        self.parse_end(parser, 'endmixin', name)
+        self.get_state(parser).mixins[name] = body
+        return []
+
+    def parse_mix(self, parser, tag):
+        name = parser.stream.expect('name')
+        state = self.get_state(parser)
+        if name.value not in state.mixins:
+            parser.fail('Mixin %r is not defined.' % name.value, name.lineno)
+        values, only = self.parse_options(parser, tag)
+        body = self.copy_body(state, state.mixins[name.value])
+        if only:
+            pairs = [nodes.Pair(nodes.Const(key), value) for key, value in values]
+            isolated = self.call_method('_isolate', [nodes.ContextReference(), nodes.Dict(pairs)])
+            return nodes.OverlayScope(isolated, body, lineno=tag.lineno)
+        if values:
+            targets = [nodes.Name(key, 'store') for key, value in values]
+            return nodes.With(targets, [value for key, value in values], body, lineno=tag.lineno)
+        return nodes.Scope(body, lineno=tag.lineno)
+
+    def copy_body(self, state, body):
+        # Each copy of a mixin needs its own slot blocks, since block names
+        # must be unique in a template.
+        scope = nodes.Scope(deepcopy(body))
+        names = {}
+        for block in scope.find_all(nodes.Block):
+            if block.name.startswith(BLOCK_PREFIX):
+                names[block.name] = block.name = state.new_block_name()
+        if names:
+            for const in scope.find_all(nodes.Const):
+                if isinstance(const.value, str):
+                    const.value = names.get(const.value, const.value)
+                elif isinstance(const.value, dict):
+                    const.value = {key: names.get(value, value) for key, value in const.value.items()}
+        return scope.body
+
+    def parse_slot_body(self, parser):
+        name = parser.stream.expect('name').value
+        # Slots aren't rendered more than once per component here, so
+        # rerender is accepted for compatibility and has nothing to turn off.
+        parser.stream.skip_if('name:rerender')
+        body = parser.parse_statements(('name:endslot',), drop_needle=True)
+        self.parse_end(parser, 'endslot', name)
+        return name, body
+
+    def parse_slot(self, parser, tag):
+        name, body = self.parse_slot_body(parser)
+        block_name = self.get_state(parser).new_block_name()
+        block = nodes.Block(block_name, body, True, False, lineno=tag.lineno)
+        render = self.call_method(
+            '_render_slot', [nodes.DerivedContextReference(), nodes.Const(name), nodes.Const(block_name)],
+        )
+        return [self.hidden_blocks([block], tag.lineno), nodes.Output([render], lineno=tag.lineno)]
+
+    def parse_component(self, parser, tag):
+        template = parser.parse_expression()
+        values, only = self.parse_options(parser, tag)
+
+        # Only slots, and whitespace between them, may appear in the tag.
+        state = self.get_state(parser)
+        stream = parser.stream
+        stream.expect('block_end')
+        blocks, overrides = [], {}
+        while True:
+            token = stream.current
+            if token.type == 'data' and not token.value.strip():
+                next(stream)
+                continue
+            if token.type == 'block_begin':
+                if stream.look().test('name:endcomponent'):
+                    next(stream)
+                    next(stream)
+                    break
+                if stream.look().test('name:slot'):
+                    next(stream)
+                    next(stream)
+                    name, body = self.parse_slot_body(parser)
+                    stream.expect('block_end')
+                    overrides[name] = state.new_block_name()
+                    blocks.append(nodes.Block(overrides[name], body, True, False, lineno=token.lineno))
+                    continue
+            if token.type == 'eof':
+                parser.fail_eof(('endcomponent',), token.lineno)
+            parser.fail("'component' tag can only contain slots.", token.lineno)
+
+        pairs = [nodes.Pair(nodes.Const(key), value) for key, value in values]
+        render = self.call_method('_render_component', [
+            nodes.DerivedContextReference(), template, nodes.Dict(pairs), nodes.Const(only), nodes.Const(overrides),
+        ])
+        output = nodes.Output([render], lineno=tag.lineno)
+        if blocks:
+            return [self.hidden_blocks(blocks, tag.lineno), output]
+        return output
+
+    def _isolate(self, context, values):
+        # Slots inside the mix still see the component being rendered.
+        values[SLOTS_KEY] = context.get(SLOTS_KEY)
+        return IsolatedVars(values, self.environment.globals)
+
+    def render_slot(self, context, name, overrides, default):
+        """
+        Render the top of ``overrides``, or ``default`` if it's empty, with
+        ``context``. Slots of the same name inside an override see the rest
+        of the stack.
+        """
+        if overrides:
+            block, rest = overrides[0], overrides[1:]
+            slots = dict(context.get(SLOTS_KEY) or {}, **{name: rest})
+        else:
+            block, rest, slots = default, False, context.get(SLOTS_KEY)
+        handle = SlotHandle(self, context, name, rest, default)
+        return Markup(self.environment.concat(block(context.derived({'slot': handle, SLOTS_KEY: slots}))))
+
+    def _render_slot(self, context, name, block_name):
+        default = context.blocks[block_name][0]
+        slots = context.get(SLOTS_KEY)
+        if slots is None:
+            handle = SlotHandle(self, context, name, None, default)
+            return Markup(self.environment.concat(default(context.derived({'slot': handle}))))
+        return self.render_slot(context, name, slots.get(name, ()), default)
+
+    def check_component(self, template):
+        """
+        Raise TemplateSyntaxError if ``template`` extends another template,
+        like the Django tag does. Its source is parsed once per compiled
+        template; templates built from a string have none to parse.
+        """
+        try:
+            extends = template.mixin_templatetag_extends
+        except AttributeError:
+            extends = None
+            if template.name is not None and self.environment.loader is not None:
+                source = self.environment.loader.get_source(self.environment, template.name)[0]
+                extends = self.environment.parse(source, template.name, template.filename).find(nodes.Extends)
+            template.mixin_templatetag_extends = extends
+        if extends is not None:
+            raise TemplateSyntaxError(
+                'Component template %r must not extend another template' % template.name,
+                extends.lineno, template.name, template.filename,
+            )
+
+    def _render_component(self, context, template_name, values, only, overrides):
+        template = self.environment.get_template(template_name, parent=context.name)
+        self.check_component(template)
+
+        # Put this component's overrides beneath those of the ones around it,
+        # which take precedence like in the Django tag.
+        slots = dict(context.get(SLOTS_KEY) or {})
+        for name, block_name in overrides.items():
+            slots[name] = slots.get(name, ()) + (context.blocks[block_name][0],)
+
+        if only:
+            data = values
+        else:
+            # get_all() may return the context's own dict, keep it untouched.
+            data = dict(context.get_all())
+            data.update(values)
+        data[SLOTS_KEY] = slots
+        component_context = template.new_context(data)
+        # The overrides, and the slots inside them, are blocks of the
+        # templates using the component.
+        for block_name, blocks in context.blocks.items():
+            if block_name.startswith(BLOCK_PREFIX):
+                component_context.blocks.setdefault(block_name, blocks)
+        return Markup(self.environment.concat(template.root_render_func(component_context)))
+
+
+mixins = MixinExtension
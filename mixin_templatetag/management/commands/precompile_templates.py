@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from mixin_templatetag.footprint import engine_footprint
+from mixin_templatetag.precompile import get_engines, precompile_templates
+
+
+class Command(BaseCommand):
+    help = (
+        "Compiles every template that uses mixins or components, resolves the components they use and reports "
+        "any errors, so they show up before the first request does."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--engine', action='append', dest='engines',
+            help="Alias of the template engine to compile. Can be given more than once; defaults to all of them.",
+        )
+        parser.add_argument(
+            '--memory', action='store_true',
+            help="Report the memory held by the mixins and components of each compiled template.",
+        )
+
+    def handle(self, *args, **options):
+        engines = get_engines()
+        aliases = options['engines'] or list(engines)
+        unknown = sorted(set(aliases) - set(engines))
+        if unknown:
+            raise CommandError("Unknown Django template engine: %s" % ', '.join(unknown))
+
+        errors = 0
+        for alias in aliases:
+            results = precompile_templates(engines[alias])
+            for result in results:
+                if result.error is not None:
+                    errors += 1
+                    self.stderr.write("%s: %s" % (result.template_name, result.error))
+                elif options['verbosity'] >= 2:
+                    self.stdout.write("%s: %.1fms" % (result.template_name, result.elapsed * 1000))
+            if options['verbosity'] >= 1:
+                self.stdout.write("Compiled %d templates for %r in %.1fms." % (
+                    len(results), alias, sum(result.elapsed for result in results) * 1000,
+                ))
+            if options['memory']:
+                self.write_footprint(engines[alias])
+        if errors:
+            raise CommandError("%d template%s failed to compile." % (errors, '' if errors == 1 else 's'))
+
+    def write_footprint(self, engine):
+        footprints = engine_footprint(engine)
+        for name, footprint in footprints:
+            self.stdout.write("%s: %d nodes, %d bytes (%s)" % (
+                name, footprint['nodes'], footprint['total'],
+                ', '.join('%s %d' % item for item in sorted(footprint['sizes'].items())),
+            ))
+        self.stdout.write("Total: %d bytes in %d templates." % (
+            sum(footprint['total'] for name, footprint in footprints), len(footprints),
+        ))
@@ -1,25 +1,194 @@
 from django import template
+from django.conf import settings
+from django.utils import timezone, translation
+
+from mixin_templatetag import compiler, stats
+from mixin_templatetag.asyncrender import aresolve_values, arender_nodelist
+from mixin_templatetag.streaming import iter_nodelist
+from mixin_templatetag.utils import EMPTY_MAPPING, LRUCache, isolate_context
+
+DEFAULT_CACHE_SIZE = 1024
+
+_render_cache = None
+
+
+def get_render_cache():
+    """
+    Return the process-wide cache of ``cached`` mix output, bounded by the
+    MIXIN_TEMPLATETAG_MIX_CACHE_SIZE setting.
+    """
+    global _render_cache
+    if _render_cache is None:
+        _render_cache = LRUCache(getattr(settings, 'MIXIN_TEMPLATETAG_MIX_CACHE_SIZE', DEFAULT_CACHE_SIZE))
+    return _render_cache
 
 
 class MixinNode(template.Node):
+    # Every attribute is a slot, including the token and origin the parser
+    # sets, so nodes never get an instance dict.
+    __slots__ = ('name', 'nodelist', 'token', 'origin')
+    # The nodelist is only rendered where it's mixed in.
+    child_nodelists = ()
+
+    def __init__(self, name, nodelist):
+        self.name, self.nodelist = name, nodelist
+
+    def __repr__(self):
+        return "<Mixin Node: %s. Contents: %r>" % (self.name, self.nodelist)
+
+    def render(self, context):
+        return ''
+
+
+class LoadMixinsNode(template.Node):
+    __slots__ = ('libraries', 'token', 'origin')
+
+    def __init__(self, libraries):
+        self.libraries = libraries
+
     def render(self, context):
         return ''
 
 
 class MixNode(template.Node):
-    def __init__(self, nodelist, *args, extra_context=None, isolated_context=False, **kwargs):
+    __slots__ = ('nodelist', 'name', 'extra_context', 'isolated_context', 'cached', 'token', 'origin')
+
+    def __init__(self, nodelist, *args, extra_context=None, isolated_context=False, cached=False, name=None,
+                 **kwargs):
         self.nodelist = nodelist
-        self.extra_context = extra_context or {}
+        self.name = name
+        self.extra_context = extra_context or EMPTY_MAPPING
         self.isolated_context = isolated_context
+        self.cached = cached
         super().__init__(*args, **kwargs)
 
+    def cache_key(self, values, context):
+        # The mixin's nodelist is kept alive next to the output, so its id
+        # can't be reused while the entry exists. The arguments are literals,
+        # but the output still depends on the active language and time zone.
+        return (id(self.nodelist), context.autoescape, context.use_l10n, context.use_tz,
+                translation.get_language(), timezone.get_current_timezone_name(),
+                tuple(sorted(values.items())))
+
     def render(self, context):
+        if stats.enabled:
+            return stats.measure('mix', self.name, self.render_mix, context)
+        return self.render_mix(context)
+
+    def render_mix(self, context):
+        values = {
+            name: var.resolve(context)
+            for name, var in self.extra_context.items()
+        }
+
+        if self.cached:
+            key = self.cache_key(values, context)
+            cache = get_render_cache()
+            entry = cache.get(key)
+            if entry is None:
+                entry = (self.nodelist, self.render_values(context, values))
+                cache.set(key, entry)
+            return entry[1]
+        return self.render_values(context, values)
+
+    def render_values(self, context, values):
+        if compiler.enabled:
+            render = compiler.get_compiled(self.nodelist, context.template.engine.debug)
+        else:
+            render = self.nodelist.render
+        if self.isolated_context:
+            return render(isolate_context(context, values))
+        with context.push(**values):
+            return render(context)
+
+    def render_iter(self, context):
+        if self.cached:
+            yield self.render(context)
+            return
         values = {
             name: var.resolve(context)
             for name, var in self.extra_context.items()
         }
+        if self.isolated_context:
+            yield from iter_nodelist(self.nodelist, isolate_context(context, values))
+        else:
+            with context.push(**values):
+                yield from iter_nodelist(self.nodelist, context)
+
+    async def arender(self, context):
+        return await self.arender_resolved(context, await self.aresolve(context))
+
+    async def aresolve(self, context):
+        return await aresolve_values(self.extra_context, context)
 
+    async def arender_resolved(self, context, values):
+        if self.cached:
+            key = self.cache_key(values, context)
+            cache = get_render_cache()
+            entry = cache.get(key)
+            if entry is None:
+                entry = (self.nodelist, await self.arender_values(context, values))
+                cache.set(key, entry)
+            return entry[1]
+        return await self.arender_values(context, values)
+
+    async def arender_values(self, context, values):
         if self.isolated_context:
-            return self.nodelist.render(context.new(values))
+            return await arender_nodelist(self.nodelist, isolate_context(context, values))
         with context.push(**values):
-            return self.nodelist.render(context)
+            return await arender_nodelist(self.nodelist, context)
+
+
+class StaticMixNode(MixNode):
+    """
+    A mix of a mixin that is nothing but text, so its output was worked out
+    when the template was parsed. Its arguments can't change the output and
+    aren't resolved.
+    """
+    __slots__ = ('static',)
+
+    def __init__(self, nodelist, static, name=None):
+        super().__init__(nodelist, name=name)
+        self.static = static
+
+    def render(self, context):
+        if stats.enabled:
+            return stats.measure('mix', self.name, self.render_mix, context)
+        return self.static
+
+    def render_mix(self, context):
+        return self.static
+
+    def render_iter(self, context):
+        yield self.static
+
+    async def aresolve(self, context):
+        return None
+
+    async def arender_resolved(self, context, values):
+        return self.static
+
+
+class InlineMixNode(MixNode):
+    """
+    A bare ``{% mix name %}`` of a mixin that can't change the context. The
+    mixin's nodes render as if they were written in place: there are no
+    arguments to resolve and no context push.
+    """
+    __slots__ = ()
+
+    def render(self, context):
+        if stats.enabled:
+            return stats.measure('mix', self.name, self.render_mix, context)
+        return self.render_mix(context)
+
+    def render_mix(self, context):
+        if compiler.enabled:
+            return compiler.get_compiled(self.nodelist, context.template.engine.debug)(context)
+        return self.nodelist.render(context)
+
+    def render_iter(self, context):
+        return iter_nodelist(self.nodelist, context)
+
+    async def arender_values(self, context, values):
+        return await arender_nodelist(self.nodelist, context)
@@ -0,0 +1,106 @@
+"""
+Compile every template that uses mixins or components ahead of the first
+request.
+
+:func:`precompile_templates` walks the template directories of an engine,
+compiles each template that uses these tags, resolves the components it refers
+to by a literal name and checks their layout. The engine's cached loader and
+the component caches are filled as a side effect, and errors that would only
+show up on the first render are reported instead. The
+``precompile_templates`` management command and the
+``MIXIN_TEMPLATETAG_PRECOMPILE`` setting run it for every engine.
+"""
+import os
+import re
+from collections import namedtuple
+from time import perf_counter
+
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+from django.template.backends.django import DjangoTemplates
+
+from mixin_templatetag import compiler
+from mixin_templatetag.componentnodes import ComponentNode, get_component_layout
+from mixin_templatetag.mixinnodes import MixinNode
+from mixin_templatetag.templatecache import get_template_cache, get_template_dirs
+
+# Templates without any of these tags are left for the loaders to compile on
+# demand.
+TAG_RE = re.compile(r'{%\s*(?:mixin|mix|load_mixins|component|component_for|slot)\s')
+
+PrecompileResult = namedtuple('PrecompileResult', ('template_name', 'elapsed', 'error'))
+
+
+def iter_template_names(engine):
+    """
+    Yield the names of the templates in the engine's directories that use
+    mixins or components. A name found in more than one directory is only
+    yielded once, like the loaders only ever find the first one.
+    """
+    seen = set()
+    for directory in get_template_dirs(engine):
+        for root, dirnames, filenames in os.walk(directory):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, directory).replace(os.sep, '/')
+                if name in seen:
+                    continue
+                seen.add(name)
+                try:
+                    with open(path, encoding=engine.file_charset) as fp:
+                        source = fp.read()
+                except (OSError, UnicodeDecodeError):
+                    continue
+                if TAG_RE.search(source):
+                    yield name
+
+
+def compile_components(engine, template, seen):
+    # Resolve and check every component referred to by a literal name, and
+    # the components those use in turn.
+    cache = get_template_cache(engine)
+    for node in template.nodelist.get_nodes_by_type(ComponentNode):
+        if not node.literal_parent or node.parent_name.var in seen:
+            continue
+        seen.add(node.parent_name.var)
+        parent = cache.get_template(node.parent_name.var)
+        get_component_layout(parent)
+        if compiler.enabled:
+            compiler.get_compiled(parent.nodelist, engine.debug)
+        compile_components(engine, parent, seen)
+
+
+def precompile_template(engine, template_name):
+    """
+    Compile one template and the components it uses and return a
+    :class:`PrecompileResult`. ``error`` is the exception raised, if any.
+    """
+    start = perf_counter()
+    try:
+        template = engine.get_template(template_name)
+        compile_components(engine, template, set())
+        if compiler.enabled:
+            for node in template.nodelist.get_nodes_by_type(MixinNode):
+                compiler.get_compiled(node.nodelist, engine.debug)
+    except (TemplateDoesNotExist, TemplateSyntaxError) as e:
+        return PrecompileResult(template_name, perf_counter() - start, e)
+    return PrecompileResult(template_name, perf_counter() - start, None)
+
+
+def precompile_templates(engine):
+    """
+    Compile every template of ``engine`` that uses mixins or components and
+    return a list of :class:`PrecompileResult`.
+    """
+    return [precompile_template(engine, name) for name in iter_template_names(engine)]
+
+
+def get_engines():
+    """
+    Return the configured Django template engines by alias.
+    """
+    return {
+        backend.name: backend.engine
+        for backend in engines.all()
+        if isinstance(backend, DjangoTemplates)
+    }
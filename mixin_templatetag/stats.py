@@ -0,0 +1,103 @@
+"""
+Opt-in render timing for components, slots and mixins.
+
+Call :func:`enable` (or set ``MIXIN_TEMPLATETAG_STATS = True``) to record, for
+each component template, slot name and mixin name, how often it rendered, the
+time spent in it with and without the components, slots and mixins inside it,
+and the size of its output. :func:`get_stats` returns the aggregates and
+:data:`node_rendered` is sent after each measured render. While disabled,
+rendering only pays for checking a module attribute.
+
+Only the regular ``render()`` path is measured; streaming and async renders
+are not.
+"""
+import threading
+from time import perf_counter
+
+from django.dispatch import Signal
+
+# Sent after each measured render with ``kind`` ('component', 'slot' or
+# 'mix'), ``name``, ``elapsed`` and ``self_time`` in seconds, and ``size``.
+node_rendered = Signal()
+
+enabled = False
+
+_local = threading.local()
+_lock = threading.Lock()
+_stats = {}
+
+
+class RenderStats:
+    __slots__ = ('kind', 'name', 'calls', 'total_time', 'self_time', 'output_size')
+
+    def __init__(self, kind, name):
+        self.kind, self.name = kind, name
+        self.calls = 0
+        self.total_time = self.self_time = 0.0
+        self.output_size = 0
+
+    def __repr__(self):
+        return '<RenderStats %s %s: %d calls, %.6fs>' % (self.kind, self.name, self.calls, self.total_time)
+
+    def as_dict(self):
+        return {attr: getattr(self, attr) for attr in self.__slots__}
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+def get_stats():
+    """
+    Return the recorded stats as a list of dicts, the most expensive first.
+    """
+    with _lock:
+        stats = [stat.as_dict() for stat in _stats.values()]
+    return sorted(stats, key=lambda stat: stat['total_time'], reverse=True)
+
+
+def record(kind, name, elapsed, self_time, size):
+    with _lock:
+        try:
+            stat = _stats[kind, name]
+        except KeyError:
+            stat = _stats[kind, name] = RenderStats(kind, name)
+        stat.calls += 1
+        stat.total_time += elapsed
+        stat.self_time += self_time
+        stat.output_size += size
+    node_rendered.send(sender=None, kind=kind, name=name, elapsed=elapsed, self_time=self_time, size=size)
+
+
+def measure(kind, name, render, *args):
+    """
+    Call ``render(*args)`` and record how long it took and how much output it
+    returned under ``kind`` and ``name``.
+    """
+    try:
+        stack = _local.stack
+    except AttributeError:
+        stack = _local.stack = []
+    # Time spent in measured renders nested in this one.
+    stack.append(0.0)
+    start = perf_counter()
+    try:
+        output = render(*args)
+    finally:
+        elapsed = perf_counter() - start
+        nested = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+    record(kind, name, elapsed, elapsed - nested, len(output))
+    return output
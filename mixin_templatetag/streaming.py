@@ -0,0 +1,108 @@
+"""
+Render templates as a stream of chunks instead of one string.
+
+Components, slots and mixins (and Django's if, for, with, extends and block
+tags) yield their output piece by piece; any other node is rendered whole and
+yielded as a single chunk. Use :func:`stream_template` with ``StreamingHttpResponse``::
+
+    template = get_template('report.html')
+    return StreamingHttpResponse(stream_template(template, {'rows': rows}, request))
+"""
+from django.template import Context
+from django.template.context import make_context
+from django.template.defaulttags import ForNode, IfNode, WithNode
+from django.template.loader_tags import BlockNode, ExtendsNode
+
+from mixin_templatetag.utils import get_extends_parent, get_if_nodelist, iter_for_loop, push_block, push_with
+
+DEFAULT_BUFFER_SIZE = 8192
+
+
+def iter_extends(node, context):
+    compiled_parent = get_extends_parent(node, context)
+    with context.render_context.push_state(compiled_parent, isolated_context=False):
+        yield from iter_nodelist(compiled_parent.nodelist, context)
+
+
+def iter_block(node, context):
+    with push_block(node, context) as block:
+        yield from iter_nodelist(block.nodelist, context)
+
+
+def iter_for(node, context):
+    for nodelist in iter_for_loop(node, context):
+        yield from iter_nodelist(nodelist, context)
+
+
+def iter_if(node, context):
+    nodelist = get_if_nodelist(node, context)
+    if nodelist is not None:
+        yield from iter_nodelist(nodelist, context)
+
+
+def iter_with(node, context):
+    with push_with(node, context):
+        yield from iter_nodelist(node.nodelist, context)
+
+
+ITERATORS = {
+    ExtendsNode: iter_extends,
+    BlockNode: iter_block,
+    ForNode: iter_for,
+    IfNode: iter_if,
+    WithNode: iter_with,
+}
+
+
+def iter_nodelist(nodelist, context):
+    """
+    Yield the rendered output of ``nodelist``, descending into any node that
+    knows how to render itself in chunks.
+    """
+    for node in nodelist:
+        render_iter = getattr(node, 'render_iter', None)
+        if render_iter is not None:
+            yield from render_iter(context)
+            continue
+        iterator = ITERATORS.get(type(node))
+        if iterator is not None:
+            yield from iterator(node, context)
+        else:
+            yield node.render_annotated(context)
+
+
+def stream_template(template, context=None, request=None, buffer_size=DEFAULT_BUFFER_SIZE):
+    """
+    Render ``template`` as a generator of strings. ``template`` may be a
+    ``django.template.Template`` or a template returned by a
+    ``DjangoTemplates`` backend, with ``context`` and ``request`` passed the
+    same way as to their ``render()``. Output is sent in chunks of at least
+    ``buffer_size`` characters, except for the last one.
+    """
+    if hasattr(template, 'backend'):
+        # django.template.backends.django.Template
+        context = make_context(context, request, autoescape=template.backend.engine.autoescape)
+        template = template.template
+    elif context is None:
+        context = Context()
+
+    buffer, size = [], 0
+    for chunk in iter_template(template, context):
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= buffer_size:
+            yield ''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def iter_template(template, context):
+    # Mirrors Template.render.
+    with context.render_context.push_state(template):
+        if context.template is None:
+            with context.bind_template(template):
+                context.template_name = template.name
+                yield from iter_nodelist(template.nodelist, context)
+        else:
+            yield from iter_nodelist(template.nodelist, context)
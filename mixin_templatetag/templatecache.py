@@ -0,0 +1,253 @@
+import os
+import re
+from threading import Lock
+from weakref import WeakKeyDictionary
+
+from django.conf import settings
+from django.dispatch import receiver
+from django.template import engines
+from django.template.loaders import cached
+
+from mixin_templatetag.mixinnodes import MixinNode
+from mixin_templatetag.utils import LRUCache
+
+try:
+    from django.utils.autoreload import file_changed
+except ImportError:  # Django < 2.2
+    file_changed = None
+
+DEFAULT_CACHE_SIZE = 128
+
+# The cached loader keys templates by name, followed by a sha1 of the skipped
+# origins when there are any.
+LOADER_KEY_SUFFIX_RE = re.compile(r'-[0-9a-f]{40}$')
+
+COMPONENT = 'component'
+MIXINS = 'mixins'
+
+_caches = WeakKeyDictionary()
+_caches_lock = Lock()
+
+
+class ComponentTemplateCache:
+    """
+    Compiled component templates for one engine. Literal template names are
+    resolved once and kept for the life of the engine; names that come from
+    variables go into a bounded LRU so arbitrary values can't grow it forever.
+    Engines without the cached loader read templates again on every render,
+    e.g. while developing, and so do their components: nothing is kept.
+    """
+
+    def __init__(self, engine, maxsize=DEFAULT_CACHE_SIZE):
+        self.engine = engine
+        self.enabled = any(isinstance(loader, cached.Loader) for loader in engine.template_loaders)
+        self.templates = {}
+        self.recent = LRUCache(maxsize)
+        self.mixin_libraries = {}
+        # Template name to {kind: names it uses} and the reverse, recorded
+        # while templates are parsed.
+        self.dependencies = {}
+        self.dependents = {}
+        self.lock = Lock()
+
+    def get_template(self, template_name, literal=True):
+        if not self.enabled:
+            return self.find_template(template_name)
+        templates = self.templates if literal else self.recent
+        template = templates.get(template_name)
+        if template is None:
+            # Not locked: threads missing at once each compile the template
+            # and the last one is kept, which renders the same.
+            template = self.find_template(template_name)
+            if literal:
+                self.templates[template_name] = template
+            else:
+                self.recent.set(template_name, template)
+        return template
+
+    def find_template(self, template_name):
+        directory = getattr(settings, 'MIXIN_TEMPLATETAG_DISK_CACHE_DIR', None)
+        if directory:
+            from mixin_templatetag.diskcache import load_template
+            return load_template(self, template_name, directory)
+        template, origin = self.engine.find_template(template_name)
+        return template
+
+    def get_mixin_library(self, template_name):
+        """
+        Return the mixins defined in a template as a dict of name to nodelist.
+        The nodelists are shared by every template that loads the library.
+        """
+        mixins = self.mixin_libraries.get(template_name)
+        if mixins is None:
+            template = self.get_template(template_name)
+            mixins = {
+                node.name: node.nodelist for node in template.nodelist.get_nodes_by_type(MixinNode)
+            }
+            if self.enabled:
+                self.mixin_libraries[template_name] = mixins
+        return mixins
+
+    def add_dependency(self, template_name, kind, dependency):
+        """
+        Record that ``template_name`` uses ``dependency`` as a ``kind``:
+        ``'component'`` or ``'mixins'``.
+        """
+        with self.lock:
+            self.dependencies.setdefault(template_name, {}).setdefault(kind, set()).add(dependency)
+            self.dependents.setdefault(dependency, {}).setdefault(kind, set()).add(template_name)
+
+    def get_dependents(self, template_name, kind=None):
+        """
+        Return the names of the templates that use ``template_name``, as a
+        component or mixin library or, with ``kind``, only as that.
+        """
+        with self.lock:
+            dependents = self.dependents.get(template_name, {})
+            if kind is not None:
+                return set(dependents.get(kind, ()))
+            return set().union(*dependents.values())
+
+    def get_dependencies(self, template_name, kind=None):
+        """
+        Return the names of the components and mixin libraries that
+        ``template_name`` uses or, with ``kind``, only those of that kind.
+        """
+        with self.lock:
+            dependencies = self.dependencies.get(template_name, {})
+            if kind is not None:
+                return set(dependencies.get(kind, ()))
+            return set().union(*dependencies.values())
+
+    def get_stale(self, template_name):
+        """
+        Return the names of the compiled templates that are out of date when
+        ``template_name`` changes: the template itself and whatever loads
+        mixins from it, directly or not. Templates using it as a component
+        look it up when they render, so they stay valid.
+        """
+        stale, pending = set(), [template_name]
+        while pending:
+            name = pending.pop()
+            if name not in stale:
+                stale.add(name)
+                pending.extend(self.get_dependents(name, MIXINS))
+        return stale
+
+    def invalidate(self, template_name):
+        """
+        Drop the compiled ``template_name`` and the templates that are stale
+        because of it (see :meth:`get_stale`) from these caches and the
+        engine's cached loaders, so they're read again when next used.
+        Return the names that were invalidated.
+        """
+        stale = self.get_stale(template_name)
+        with self.lock:
+            for name in stale:
+                # The template records its dependencies again when it's parsed.
+                for kind, dependencies in self.dependencies.pop(name, {}).items():
+                    for dependency in dependencies:
+                        self.dependents.get(dependency, {}).get(kind, set()).discard(name)
+        for name in stale:
+            self.templates.pop(name, None)
+            self.recent.pop(name)
+            self.mixin_libraries.pop(name, None)
+        for loader in self.engine.template_loaders:
+            cache = getattr(loader, 'get_template_cache', None)
+            if cache is None:
+                continue
+            for key in list(cache):
+                if LOADER_KEY_SUFFIX_RE.sub('', key) in stale:
+                    cache.pop(key, None)
+        return stale
+
+    def clear(self):
+        self.templates.clear()
+        self.recent.clear()
+        self.mixin_libraries.clear()
+        with self.lock:
+            self.dependencies.clear()
+            self.dependents.clear()
+
+
+def get_template_cache(engine):
+    try:
+        return _caches[engine]
+    except KeyError:
+        maxsize = getattr(settings, 'MIXIN_TEMPLATETAG_COMPONENT_CACHE_SIZE', DEFAULT_CACHE_SIZE)
+        with _caches_lock:
+            return _caches.setdefault(engine, ComponentTemplateCache(engine, maxsize))
+
+
+def get_parser_engine(parser):
+    """
+    Return the engine a template is being compiled for, or None if it can't
+    be told. Templates built from a string don't have a loader, only the
+    libraries of their engine, which are looked for among the engines of the
+    TEMPLATES setting.
+    """
+    loader = getattr(parser.origin, 'loader', None)
+    if loader is not None:
+        return loader.engine
+    # Each engine gives its parsers its own dict of libraries.
+    for backend in engines.all():
+        engine = getattr(backend, 'engine', None)
+        if getattr(engine, 'template_libraries', None) is parser.libraries:
+            return engine
+    return None
+
+
+def get_template_dirs(engine):
+    """
+    Return the directories the engine's loaders read templates from.
+    """
+    dirs = []
+    for loader in engine.template_loaders:
+        # The cached loader wraps the real ones.
+        for loader in getattr(loader, 'loaders', (loader,)):
+            for directory in getattr(loader, 'get_dirs', list)():
+                if str(directory) not in dirs:
+                    dirs.append(str(directory))
+    return dirs
+
+
+def clear_template_caches():
+    for cache in list(_caches.values()):
+        cache.clear()
+
+
+def invalidate_template(template_name):
+    """
+    Invalidate ``template_name`` in the caches of every engine. Return the
+    names of the templates that were invalidated.
+    """
+    invalidated = set()
+    for cache in list(_caches.values()):
+        invalidated |= cache.invalidate(template_name)
+    return invalidated
+
+
+def invalidate_file(file_path):
+    """
+    Invalidate the template at ``file_path`` in every engine whose template
+    directories contain it. Return whether any engine did.
+    """
+    file_path = os.path.abspath(str(file_path))
+    found = False
+    for cache in list(_caches.values()):
+        for directory in get_template_dirs(cache.engine):
+            directory = os.path.abspath(directory)
+            if file_path.startswith(directory + os.sep):
+                cache.invalidate(os.path.relpath(file_path, directory).replace(os.sep, '/'))
+                found = True
+    return found
+
+
+if file_changed is not None:
+    @receiver(file_changed, dispatch_uid='mixin_templatetag_template_changed')
+    def template_changed(sender, file_path, **kwargs):
+        # Python changes restart the server anyway; anything else may be a
+        # template. Drop what depends on it, or everything if we can't tell
+        # which template it is, and let the loaders re-read it.
+        if os.path.splitext(str(file_path))[1] != '.py' and not invalidate_file(file_path):
+            clear_template_caches()
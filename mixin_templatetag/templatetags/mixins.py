@@ -1,29 +1,139 @@
+import re
+
 from django import template
-from django.template import TemplateSyntaxError
-from django.template.base import token_kwargs, TextNode
+from django.template import TemplateSyntaxError, Variable
+from django.template.base import FILTER_SEPARATOR, kwarg_re, NodeList, TextNode, VariableNode
+from django.template.loader_tags import BlockNode
+from django.template import defaulttags
 from django.template.defaulttags import CommentNode
 from django.template.loader_tags import construct_relative_path
 
-from mixin_templatetag.componentnodes import SlotNode, ComponentNode
-from mixin_templatetag.mixinnodes import MixinNode, MixNode
+from mixin_templatetag.componentnodes import SlotNode, ComponentNode, ComponentForNode
+from mixin_templatetag.mixinnodes import InlineMixNode, LoadMixinsNode, MixinNode, MixNode, StaticMixNode
+from mixin_templatetag.templatecache import COMPONENT, MIXINS, get_parser_engine, get_template_cache
+from mixin_templatetag.utils import EMPTY_NODELIST, static_output
 
 register = template.Library()
 
+INVALID_LOOPVAR_CHARS = frozenset((' ', '"', "'", FILTER_SEPARATOR))
+
+# Nodes that never write to the context they are rendered in.
+PASSIVE_NODES = (
+    TextNode, VariableNode, CommentNode, MixinNode, LoadMixinsNode, defaulttags.CsrfTokenNode,
+    defaulttags.DebugNode, defaulttags.LoadNode, defaulttags.LoremNode, defaulttags.TemplateTagNode,
+    defaulttags.VerbatimNode,
+)
+# Nodes that render their children in the context they are rendered in.
+TRANSPARENT_NODES = (
+    InlineMixNode, defaulttags.AutoEscapeControlNode, defaulttags.FilterNode, defaulttags.IfChangedNode,
+    defaulttags.IfNode, defaulttags.SpacelessNode,
+)
+# Nodes that render their children in a context of their own.
+SCOPED_NODES = (
+    MixNode, SlotNode, ComponentNode, BlockNode, defaulttags.ForNode, defaulttags.WithNode,
+)
+
+
+class ParseState:
+    """
+    What the mixin tags keep on a parser while it parses one template.
+    """
+    __slots__ = ('mixins', 'defined', 'passive', 'static')
+
+    def __init__(self):
+        # Every mixin ``mix`` can use, defined or loaded, by name.
+        self.mixins = {}
+        # The names of the mixins defined in the template, which must be unique.
+        self.defined = set()
+        # Whether each mixin's nodelist is passive, and its output if it's
+        # static, worked out on first use.
+        self.passive = {}
+        self.static = {}
+
+    def define(self, name):
+        if name in self.defined:
+            return False
+        self.defined.add(name)
+        return True
+
+    def add_mixins(self, mixins):
+        self.mixins.update(mixins)
+        for name in mixins:
+            self.passive.pop(name, None)
+            self.static.pop(name, None)
+
+    def is_passive(self, name):
+        try:
+            return self.passive[name]
+        except KeyError:
+            passive = self.passive[name] = is_passive(self.mixins[name])
+            return passive
+
+    def get_static(self, name):
+        try:
+            return self.static[name]
+        except KeyError:
+            static = self.static[name] = static_output(self.mixins[name])
+            return static
 
-def parse_options(bits, options, parser):
-    remaining_bits = bits[2:]
-    while remaining_bits:
-        option = remaining_bits.pop(0)
+
+def get_parse_state(parser):
+    # Made by the first mixin tag of the template, and gone with the parser.
+    state = getattr(parser, 'mixin_templatetag_state', None)
+    if state is None:
+        state = parser.mixin_templatetag_state = ParseState()
+    return state
+
+
+def parse_kwargs(bits, index, parser):
+    # Like token_kwargs without the legacy format, reading from ``index``
+    # instead of consuming the list.
+    kwargs = {}
+    while index < len(bits):
+        match = kwarg_re.match(bits[index])
+        if not match or not match.group(1):
+            break
+        key, value = match.groups()
+        kwargs[key] = parser.compile_filter(value)
+        index += 1
+    return kwargs, index
+
+
+def parse_values(bits, index, parser, stop):
+    # Everything up to the next option is a value.
+    values = []
+    while index < len(bits) and bits[index] not in stop:
+        values.append(parser.compile_filter(bits[index]))
+        index += 1
+    return values, index
+
+
+def parse_options(bits, options, parser, flags=(), arguments=()):
+    known_options = ('with', 'only') + flags + arguments
+    index, count = 2, len(bits)
+    while index < count:
+        option = bits[index]
+        index += 1
         if option in options:
             raise TemplateSyntaxError('The %r option was specified more '
                                       'than once.' % option)
         if option == 'with':
-            value = token_kwargs(remaining_bits, parser, support_legacy=False)
+            value, index = parse_kwargs(bits, index, parser)
             if not value:
                 raise TemplateSyntaxError('"with" in %r tag needs at least '
                                           'one keyword argument.' % bits[0])
-        elif option == 'only':
+        elif option == 'only' or option in flags:
             value = True
+        elif option == 'vary_on' and option in arguments:
+            value, index = parse_values(bits, index, parser, known_options)
+            if not value:
+                raise TemplateSyntaxError('"vary_on" in %r tag needs at least '
+                                          'one value.' % bits[0])
+        elif option in arguments:
+            if index == count:
+                raise TemplateSyntaxError('%r in %r tag needs a value.' % (option, bits[0]))
+            value = parser.compile_filter(bits[index])
+            index += 1
         else:
             raise TemplateSyntaxError('Unknown argument for %r tag: %r.' %
                                       (bits[0], option))
@@ -33,6 +143,40 @@ def parse_options(bits, options, parser):
     return isolated_context, namemap
 
 
+def add_dependency(parser, kind, filter_expression):
+    # Templates built from strings can't be reloaded, so only those that came
+    # from a loader are recorded.
+    template_name = getattr(parser.origin, 'template_name', None)
+    if template_name is None or filter_expression.filters or isinstance(filter_expression.var, Variable):
+        return
+    engine = get_parser_engine(parser)
+    if engine is not None:
+        get_template_cache(engine).add_dependency(template_name, kind, filter_expression.var)
+
+
+def is_literal(filter_expression):
+    """
+    Return whether ``filter_expression`` is a string or number without
+    filters, which resolves to the same value in any context.
+    """
+    var = filter_expression.var
+    return not filter_expression.filters and not (isinstance(var, Variable) and var.lookups is not None)
+
+
+def is_passive(nodelist):
+    """
+    Return whether rendering ``nodelist`` leaves the context as it was, so it
+    can be rendered in place without a context push of its own.
+    """
+    for node in nodelist:
+        if isinstance(node, TRANSPARENT_NODES):
+            if not all(is_passive(getattr(node, attr, None) or ()) for attr in node.child_nodelists):
+                return False
+        elif not isinstance(node, PASSIVE_NODES + SCOPED_NODES):
+            return False
+    return True
+
+
 @register.tag('mixin')
 def do_mixinblock(parser, token):
     """
@@ -43,14 +187,11 @@ def do_mixinblock(parser, token):
     if len(bits) != 2:
         raise TemplateSyntaxError("'%s' tag takes only one argument" % bits[0])
     block_name = bits[1]
-    # Keep track of the names of BlockNodes found in this template, so we can
-    # check for duplication.
-    try:
-        if block_name in parser.__loaded_mixins:
-            raise TemplateSyntaxError("'%s' tag with name '%s' appears more than once" % (bits[0], block_name))
-        parser.__loaded_mixins.append(block_name)
-    except AttributeError:  # parser.__loaded_mixins isn't a list yet
-        parser.__loaded_mixins = [block_name]
+    # Keep track of the names of the mixins defined in this template, so we
+    # can check for duplication.
+    state = get_parse_state(parser)
+    if not state.define(block_name):
+        raise TemplateSyntaxError("'%s' tag with name '%s' appears more than once" % (bits[0], block_name))
     nodelist = parser.parse(('endmixin',))
 
     # This check is kept for backwards-compatibility. See #3100.
@@ -59,12 +200,46 @@ def do_mixinblock(parser, token):
     if endblock.contents not in acceptable_endblocks:
         parser.invalid_block_tag(endblock, 'endmixin', acceptable_endblocks)
 
-    try:
-        parser.__mixins[block_name] = nodelist
-    except AttributeError:  # parser.__mixins isn't a list yet
-        parser.__mixins = {block_name: nodelist}
+    state.add_mixins({block_name: nodelist})
+
+    return MixinNode(block_name, nodelist)
 
-    return MixinNode()
+
+@register.tag('load_mixins')
+def do_load_mixins(parser, token):
+    """
+    Make the mixins defined in other templates available to ``mix``. Each
+    library is compiled once per engine and its mixins are shared::
+        {% load_mixins 'mixins/forms.html' 'mixins/icons.html' %}
+    Libraries are found with the loaders of the template's engine, so
+    templates built from a string can only load them with the engines of the
+    TEMPLATES setting.
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise TemplateSyntaxError(
+            "%r tag takes at least one argument: the name of the template "
+            "defining the mixins." % bits[0]
+        )
+    engine = get_parser_engine(parser)
+    if engine is None:
+        raise TemplateSyntaxError(
+            "%r tag can't find the engine of a template built from a string "
+            "outside of the TEMPLATES setting; load the template with the "
+            "engine's loaders instead." % bits[0]
+        )
+    cache = get_template_cache(engine)
+    state = get_parse_state(parser)
+    libraries = []
+    for bit in bits[1:]:
+        library = parser.compile_filter(construct_relative_path(parser.origin.template_name, bit))
+        if library.filters or isinstance(library.var, Variable):
+            raise TemplateSyntaxError("%r tag only takes quoted template names." % bits[0])
+        mixins = cache.get_mixin_library(library.var)
+        add_dependency(parser, MIXINS, library)
+        state.add_mixins(mixins)
+        libraries.append(library.var)
+    return LoadMixinsNode(libraries)
 
 
 @register.tag('mix')
@@ -79,6 +254,9 @@ def do_mix(parser, token):
     the mixin::
         {% mix foo only %}
         {% mix foo with bar="1" only %}
+    Isolated mixes with literal arguments can add ``cached`` to render once
+    per set of argument values and reuse that output afterwards::
+        {% mix icon with name="star" only cached %}
     """
     bits = token.split_contents()
     if len(bits) < 2:
@@ -88,17 +266,71 @@ def do_mix(parser, token):
         )
 
     mixin_name = bits[1]
-
-    if mixin_name not in parser.__mixins:
+    state = get_parse_state(parser)
+    try:
+        nodelist = state.mixins[mixin_name]
+    except KeyError:
         raise TemplateSyntaxError("'%s' tag with mixin '%s' cannot be found." % (bits[0], mixin_name))
 
+    static = state.get_static(mixin_name)
+    if len(bits) == 2 and static is None and state.is_passive(mixin_name):
+        return InlineMixNode(nodelist=nodelist, name=mixin_name)
+
     options = {}
-    isolated_context, namemap = parse_options(bits, options, parser)
-    return MixNode(nodelist=parser.__mixins[mixin_name], extra_context=namemap, isolated_context=isolated_context)
+    isolated_context, namemap = parse_options(bits, options, parser, flags=('cached',))
+    cached = options.get('cached', False)
+    if cached and not isolated_context:
+        raise TemplateSyntaxError('"cached" in %r tag requires "only".' % bits[0])
+    if cached and not all(is_literal(value) for value in namemap.values()):
+        # The output is shared by the whole process; values looked up in the
+        # context may be equal without rendering the same.
+        raise TemplateSyntaxError('"cached" in %r tag only takes literal arguments.' % bits[0])
+    if static is not None:
+        return StaticMixNode(nodelist, static, name=mixin_name)
+    return MixNode(nodelist=nodelist, extra_context=namemap, isolated_context=isolated_context,
+                   cached=cached, name=mixin_name)
+
+
+def parse_slots(parser, tag_name, end_tag):
+    """
+    Parse the body of a component tag, which may only contain slots.
+    """
+    nodelist = parser.parse((end_tag,))
+
+    # This check is kept for backwards-compatibility. See #3100.
+    endblock = parser.next_token()
+    acceptable_endblocks = (end_tag,)
+    if endblock.contents not in acceptable_endblocks:
+        parser.invalid_block_tag(endblock, end_tag, acceptable_endblocks)
+
+    for node in nodelist:
+        if isinstance(node, TextNode) and len(node.s.strip()) == 0 or isinstance(node, CommentNode):
+            # whitespace/comments are a-ok
+            continue
+
+        if not isinstance(node, SlotNode):
+            raise TemplateSyntaxError("'%s' only allows slots" % tag_name)
+    # The whitespace and comments are never rendered, so only the slots are
+    # kept, and components without any share one empty nodelist.
+    slots = [node for node in nodelist if isinstance(node, SlotNode)]
+    return NodeList(slots) if slots else EMPTY_NODELIST
 
 
 @register.tag('component')
 def do_component(parser, token):
+    """
+    Render a component template, replacing the slots it defines with the ones
+    given inside the tag. Takes ``with`` and ``only`` like ``mix``::
+        {% component 'card.html' with title="Hi" only %}
+            {% slot body %}...{% endslot %}
+        {% endcomponent %}
+    Use ``cache`` with a timeout in seconds, and optionally ``vary_on`` with
+    any number of values, to store the output in Django's cache::
+        {% component 'card.html' with item=item cache 300 vary_on item.pk %}
+    With ``only``, ``dedupe`` reuses the output of an identical component
+    rendered earlier in the same render::
+        {% component 'avatar.html' with user=user only dedupe %}{% endcomponent %}
+    """
     bits = token.split_contents()
     if len(bits) < 2:
         raise TemplateSyntaxError(
@@ -107,38 +339,76 @@ def do_component(parser, token):
         )
     bits[1] = construct_relative_path(parser.origin.template_name, bits[1])
     parent_name = parser.compile_filter(bits[1])
+    add_dependency(parser, COMPONENT, parent_name)
+    nodelist = parse_slots(parser, bits[0], 'endcomponent')
 
-    nodelist = parser.parse(('endcomponent',))
+    options = {}
+    isolated_context, namemap = parse_options(bits, options, parser, flags=('dedupe',),
+                                              arguments=('cache', 'vary_on'))
+    if 'vary_on' in options and 'cache' not in options:
+        raise TemplateSyntaxError('"vary_on" in %r tag requires "cache".' % bits[0])
+    if 'dedupe' in options and not isolated_context:
+        raise TemplateSyntaxError('"dedupe" in %r tag requires "only".' % bits[0])
+    return ComponentNode(nodelist, parent_name, extra_context=namemap, isolated_context=isolated_context,
+                         cache_timeout=options.get('cache'), vary_on=options.get('vary_on', ()),
+                         dedupe=options.get('dedupe', False))
 
-    # This check is kept for backwards-compatibility. See #3100.
-    endblock = parser.next_token()
-    acceptable_endblocks = ('endcomponent')
-    if endblock.contents not in acceptable_endblocks:
-        parser.invalid_block_tag(endblock, 'endcomponent', acceptable_endblocks)
 
-    for node in nodelist:
-        if isinstance(node, TextNode) and len(node.s.strip()) == 0 or isinstance(node, CommentNode):
-            # whitespace/comments are a-ok
-            continue
+@register.tag('component_for')
+def do_component_for(parser, token):
+    """
+    Render a component once for each item of a sequence, setting it up only
+    once. ``forloop`` is available like in ``for``::
+        {% component_for item in items 'card.html' with title=item.name %}
+            {% slot footer %}{{ forloop.counter }}{% endslot %}
+        {% endcomponent_for %}
+    Arguments that don't use the loop variables are resolved once for the
+    whole loop. With ``only`` the component gets nothing but its arguments,
+    like a component inside ``for``, so pass it what it needs of the loop::
+        {% component_for item in items 'card.html' with title=item.name counter=forloop.counter only %}
+    """
+    bits = token.split_contents()
+    try:
+        in_index = bits.index('in')
+    except ValueError:
+        in_index = -1
+    if in_index < 2 or len(bits) < in_index + 3:
+        raise TemplateSyntaxError(
+            "'%s' statements should use the format '%s x in y template'." % (bits[0], bits[0])
+        )
+    loopvars = re.split(r' *, *', ' '.join(bits[1:in_index]))
+    for var in loopvars:
+        if not var or not INVALID_LOOPVAR_CHARS.isdisjoint(var):
+            raise TemplateSyntaxError("'%s' tag received an invalid argument: %s" % (bits[0], token.contents))
+    sequence = parser.compile_filter(bits[in_index + 1])
 
-        # The ExtendsNode has to be the first non-text node.
-        if not isinstance(node, SlotNode):
-            raise TemplateSyntaxError("'%s' only allows slots" % bits[0])
+    bits = [bits[0], construct_relative_path(parser.origin.template_name, bits[in_index + 2])] + bits[in_index + 3:]
+    parent_name = parser.compile_filter(bits[1])
+    add_dependency(parser, COMPONENT, parent_name)
+    nodelist = parse_slots(parser, bits[0], 'endcomponent_for')
 
     options = {}
     isolated_context, namemap = parse_options(bits, options, parser)
-    return ComponentNode(nodelist, parent_name, extra_context=namemap, isolated_context=isolated_context)
+    return ComponentForNode(loopvars, sequence, nodelist, parent_name, extra_context=namemap,
+                            isolated_context=isolated_context)
 
 
 @register.tag('slot')
 def do_slot(parser, token):
     """
-    Define a block that can be overridden by child templates.
+    Define a block that can be overridden by child templates. An override of a
+    slot referenced more than once is rendered once per component; add
+    ``rerender`` to either side if its output depends on where it is::
+        {% slot title rerender %}...{% endslot %}
     """
     # token.split_contents() isn't useful here because this tag doesn't accept variable as arguments
     bits = token.contents.split()
-    if len(bits) != 2:
-        raise TemplateSyntaxError("'%s' tag takes only one argument" % bits[0])
+    if len(bits) == 3 and bits[2] == 'rerender':
+        rerender = True
+    elif len(bits) == 2:
+        rerender = False
+    else:
+        raise TemplateSyntaxError("'%s' tag takes one argument and an optional 'rerender'" % bits[0])
     block_name = bits[1]
 
     nodelist = parser.parse(('endslot',))
@@ -149,4 +419,4 @@ def do_slot(parser, token):
     if endblock.contents not in acceptable_endblocks:
         parser.invalid_block_tag(endblock, 'endslot', acceptable_endblocks)
 
-    return SlotNode(block_name, nodelist)
+    return SlotNode(block_name, nodelist, rerender=rerender)
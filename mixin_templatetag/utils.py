@@ -0,0 +1,251 @@
+import hashlib
+import re
+from collections import OrderedDict
+from contextlib import contextmanager
+from threading import Lock
+from types import MappingProxyType
+
+from django.conf import settings
+from django.template import Context, VariableDoesNotExist
+from django.template.base import NodeList, TextNode
+from django.template.defaulttags import CommentNode
+from django.template.loader_tags import BLOCK_CONTEXT_KEY, BlockContext, BlockNode, ExtendsNode
+from django.utils.safestring import mark_safe
+
+# Shared by every node that has no arguments or slot overrides, instead of an
+# empty dict or nodelist each.
+EMPTY_MAPPING = MappingProxyType({})
+EMPTY_NODELIST = NodeList()
+
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+class LRUCache:
+    """
+    A small thread-safe mapping that evicts the least recently used entry once
+    it holds more than ``maxsize`` items.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = Lock()
+
+    def __len__(self):
+        return len(self.data)
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                self.data.move_to_end(key)
+            except KeyError:
+                return default
+            return self.data[key]
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self.lock:
+            return self.data.pop(key, default)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+def nodelist_fingerprint(nodelist):
+    """
+    Return a digest of the source of ``nodelist`` that is stable across
+    processes, so it can be used in shared cache keys.
+    """
+    digest = hashlib.md5()
+
+    def update(nodes):
+        for node in nodes:
+            digest.update(type(node).__name__.encode())
+            if isinstance(node, TextNode):
+                digest.update(node.s.encode())
+                continue
+            token = getattr(node, 'token', None)
+            if token is not None:
+                digest.update(token.contents.encode())
+            for attr in node.child_nodelists:
+                update(getattr(node, attr, None) or ())
+
+    update(nodelist)
+    return digest.hexdigest()
+
+
+def static_output(nodelist):
+    """
+    Return the output of ``nodelist`` as a safe string if it's nothing but
+    text, which renders the same in any context, and None otherwise. With
+    ``MIXIN_TEMPLATETAG_COLLAPSE_WHITESPACE`` runs of whitespace in it become
+    a single space.
+    """
+    text = []
+    for node in nodelist:
+        if isinstance(node, TextNode):
+            text.append(node.s)
+        elif not isinstance(node, CommentNode):
+            return None
+    text = ''.join(text)
+    if getattr(settings, 'MIXIN_TEMPLATETAG_COLLAPSE_WHITESPACE', False):
+        text = WHITESPACE_RE.sub(' ', text)
+    return mark_safe(text)
+
+
+class IsolatedContext(Context):
+    """
+    The context ``only`` renders mixins and components in. It holds nothing
+    but the values given, like ``context.new(values)``, and shares the render
+    state of the context it was made from instead of copying it.
+    """
+
+
+def isolate_context(context, values):
+    """
+    Return an :class:`IsolatedContext` with ``values`` and the settings and
+    render state of ``context``. Rendering nests strictly, so everything
+    pushed on the shared render context is popped before it's used again.
+    """
+    isolated = IsolatedContext.__new__(IsolatedContext)
+    isolated.autoescape = context.autoescape
+    isolated.use_l10n = context.use_l10n
+    isolated.use_tz = context.use_tz
+    isolated.template_name = context.template_name
+    isolated.template = context.template
+    isolated.render_context = context.render_context
+    # Tags like url read the request of a RequestContext.
+    request = getattr(context, 'request', None)
+    if request is not None:
+        isolated.request = request
+    isolated.dicts = [{'True': True, 'False': False, 'None': None}, values]
+    return isolated
+
+
+def get_extends_parent(node, context):
+    """
+    Return the template that ``node``, an ExtendsNode, extends, after adding
+    the blocks of both to the block context. Mirrors ExtendsNode.render for
+    the streaming and async renderers, which only differ in how they render
+    the parent's nodelist.
+    """
+    compiled_parent = node.get_parent(context)
+
+    if BLOCK_CONTEXT_KEY not in context.render_context:
+        context.render_context[BLOCK_CONTEXT_KEY] = BlockContext()
+    block_context = context.render_context[BLOCK_CONTEXT_KEY]
+    block_context.add_blocks(node.blocks)
+
+    for parent_node in compiled_parent.nodelist:
+        if not isinstance(parent_node, TextNode):
+            if not isinstance(parent_node, ExtendsNode):
+                blocks = {n.name: n for n in compiled_parent.nodelist.get_nodes_by_type(BlockNode)}
+                block_context.add_blocks(blocks)
+            break
+    return compiled_parent
+
+
+@contextmanager
+def push_block(node, context):
+    """
+    Push ``context`` for rendering ``node``, a BlockNode, and yield the block
+    whose nodelist renders in its place. Mirrors BlockNode.render.
+    """
+    block_context = context.render_context.get(BLOCK_CONTEXT_KEY)
+    with context.push():
+        if block_context is None:
+            context['block'] = node
+            yield node
+            return
+        push = block = block_context.pop(node.name)
+        if block is None:
+            block = node
+        block = type(node)(block.name, block.nodelist)
+        block.context = context
+        context['block'] = block
+        yield block
+        if push is not None:
+            block_context.push(node.name, push)
+
+
+def iter_for_loop(node, context):
+    """
+    Set up ``context`` for each pass of ``node``, a ForNode, and yield the
+    nodelist to render in it, or yield its empty nodelist once if there's
+    nothing to loop over. Mirrors ForNode.render for the streaming and async
+    renderers.
+    """
+    parentloop = context['forloop'] if 'forloop' in context else {}
+    with context.push():
+        values = node.sequence.resolve(context, ignore_failures=True)
+        if values is None:
+            values = []
+        if not hasattr(values, '__len__'):
+            values = list(values)
+        len_values = len(values)
+        if len_values < 1:
+            yield node.nodelist_empty
+            return
+        if node.is_reversed:
+            values = reversed(values)
+        num_loopvars = len(node.loopvars)
+        unpack = num_loopvars > 1
+        loop_dict = context['forloop'] = {'parentloop': parentloop}
+        for i, item in enumerate(values):
+            loop_dict['counter0'] = i
+            loop_dict['counter'] = i + 1
+            loop_dict['revcounter'] = len_values - i
+            loop_dict['revcounter0'] = len_values - i - 1
+            loop_dict['first'] = (i == 0)
+            loop_dict['last'] = (i == len_values - 1)
+
+            if unpack:
+                try:
+                    len_item = len(item)
+                except TypeError:  # not an iterable
+                    len_item = 1
+                if num_loopvars != len_item:
+                    raise ValueError(
+                        'Need {} values to unpack in for loop; got {}. '.format(num_loopvars, len_item),
+                    )
+                context.update(dict(zip(node.loopvars, item)))
+                yield node.nodelist_loop
+                context.pop()
+            else:
+                context[node.loopvars[0]] = item
+                yield node.nodelist_loop
+
+
+def get_if_nodelist(node, context):
+    """
+    Return the nodelist of the first branch of ``node``, an IfNode, whose
+    condition holds, or None. Mirrors IfNode.render.
+    """
+    for condition, nodelist in node.conditions_nodelists:
+        if condition is None:  # else clause
+            return nodelist
+        try:
+            match = condition.eval(context)
+        except VariableDoesNotExist:
+            match = None
+        if match:
+            return nodelist
+    return None
+
+
+def push_with(node, context):
+    """
+    Push the values of ``node``, a WithNode, on ``context``, as a context
+    manager. Mirrors WithNode.render.
+    """
+    return context.push(**{key: val.resolve(context) for key, val in node.extra_context.items()})
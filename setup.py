@@ -100,7 +100,7 @@ setup(
         'Source': 'https://github.com/benlei/django-template-mixins',
     },
     license='BSD',
-    packages=find_packages(exclude=('tests',)),
+    packages=find_packages(exclude=('tests', 'benchmarks')),
     package_data=find_package_data(),
     keywords="django template templatetag mixin component slot",
     long_description=open(os.path.join(os.path.dirname(__file__), 'README.rst')).read(),
@@ -127,4 +127,7 @@ setup(
     install_requires=[
         "django",
     ],
+    extras_require={
+        "jinja2": ["Jinja2>=3.0"],
+    },
 )
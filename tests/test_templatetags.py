@@ -1,16 +1,111 @@
+import asyncio
 import os
+import unittest
+import warnings
 
 import django
 from django.conf import settings
 from django.template import Context, Template, TemplateSyntaxError, Engine
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, override_settings
+
+try:
+    import jinja2
+except ImportError:
+    jinja2 = None
 
 BASE_DIR = os.path.dirname(__file__)
 
 
+# Scenarios rendered with both the Django tags and the Jinja2 extension: the
+# source, its context and the expected output, or None if rendering must fail.
+SHARED_SCENARIOS = (
+    ("""
+        {% mixin foo %}<div><div>{{ name }}</div><div>{{ description }}</div></div>{% endmixin %}
+        {% mix foo with name="hello" description="world" %}----{% mix foo with name="good" description="bye" %}
+    """, {}, """
+        <div><div>hello</div><div>world</div></div>----<div><div>good</div><div>bye</div></div>
+    """),
+    ("""
+        {% mixin foo %}[{{ name }}{{ outer }}]{% endmixin %}
+        {% mix foo with name=outer|upper %}{% mix foo with name='c' only %}
+    """, {'outer': 'a'}, '[Aa][c]'),
+    ("""
+        {% component 'sub_component_main.html' %}
+            {% slot main_slot %}<h1>custom main_slot</h1>{% endslot %}
+        {% endcomponent %}
+    """, {}, "<div><h1>custom main_slot</h1><p>custom sub_slot</p></div>"),
+    ("""
+        {% component 'sub_component_sub2.html' with value=value|upper %}
+            {% slot sub2_slot %}{{ value }}{{ outside }}{% endslot %}
+        {% endcomponent %}
+        {% component 'sub_component_sub2.html' with value=value only %}
+            {% slot sub2_slot %}{{ value }}{{ outside }}{% endslot %}
+        {% endcomponent %}
+    """, {'value': 'a', 'outside': 'x'}, '<span>Ax</span><span>a</span>'),
+    ("""
+        {% for i in '123' %}
+            {% component 'nested_same_slot.html' %}{% slot title %}title {{ i }}{% endslot %}{% endcomponent %}
+        {% endfor %}
+        {% component 'sub_component_sub2.html' %}{% endcomponent %}
+    """, {}, """
+        <section>title 1<span>title 1</span></section>
+        <section>title 2<span>title 2</span></section>
+        <section>title 3<span>title 3</span></section>
+        <span>default sub2_slot</span>
+    """),
+    ("""
+        {% component 'sub_component_sub2.html' %}
+            {% slot sub2_slot %}{{ slot.name }}: {{ slot.super }}!{% endslot %}
+        {% endcomponent %}
+    """, {}, "<span>sub2_slot: default sub2_slot!</span>"),
+    ("""
+        {% mixin card %}{% component 'sub_component_sub2.html' %}
+            {% slot sub2_slot %}[{{ label }}]{% endslot %}
+        {% endcomponent %}{% endmixin %}
+        {% mix card with label='a' %}{% mix card with label='b' only %}
+    """, {}, '<span>[a]</span><span>[b]</span>'),
+    # The template using a component overrides the slots of the components
+    # inside it, and slot.super goes down to the inner overrides.
+    ("""
+        {% component 'nested_override.html' %}{% slot sub2_slot %}outer{% endslot %}{% endcomponent %}
+        {% component 'nested_override.html' %}{% slot sub2_slot %}outer {{ slot.super }}{% endslot %}{% endcomponent %}
+        {% component 'nested_override.html' %}{% endcomponent %}
+    """, {}, """
+        <span>outer</span><span>outer middle default sub2_slot</span><span>middle default sub2_slot</span>
+    """),
+    ("{% slot foo %}{{ slot.super }}{% endslot %}", {}, None),
+    ("{% component 'component_extends.html' %}{% endcomponent %}", {}, None),
+)
+
+
+def check_shared_scenarios(test, render, errors):
+    for source, context, expected in SHARED_SCENARIOS:
+        with test.subTest(source=source):
+            if expected is None:
+                with test.assertRaises(errors):
+                    render(source, context)
+            else:
+                test.assertHTMLEqual(render(source, context), expected)
+
+
+def run_async(coroutine):
+    # Like asyncio.run(), which needs Python 3.7.
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
 class MixinTest(SimpleTestCase):
     @classmethod
     def setUpClass(cls):
+        if not settings.configured:
+            cls.configure_settings()
+        super().setUpClass()
+
+    @staticmethod
+    def configure_settings():
         settings.configure(
             INSTALLED_APPS=(
                 'django.contrib.sites',
@@ -24,14 +119,16 @@ class MixinTest(SimpleTestCase):
                     'builtins': [
                         'mixin_templatetag.templatetags.mixins',
                     ],
+                    # The default with debug from Django 4.1 on.
+                    'loaders': [
+                        ('django.template.loaders.cached.Loader', ['django.template.loaders.filesystem.Loader']),
+                    ],
                 }
             }],
             DEBUG=True,
         )
         django.setup()
 
-        super().setUpClass()
-
     def test_render(self):
         context = Context({})
         result = Template("""
@@ -65,6 +162,10 @@ class MixinTest(SimpleTestCase):
                 {% mix foob with name="hello" description="world" %}
             """).render(context)
 
+    def test_shared_scenarios(self):
+        check_shared_scenarios(self, lambda source, context: Template(source).render(Context(context)),
+                               TemplateSyntaxError)
+
     def test_extend_for_reference(self):
         engine = Engine.get_default()
         template = engine.get_template('content.html')
@@ -172,3 +273,939 @@ class MixinTest(SimpleTestCase):
             </main>
         """)
 
+    def test_component_template_cache(self):
+        from mixin_templatetag.templatecache import get_template_cache
+
+        engine = Engine.get_default()
+        cache = get_template_cache(engine)
+        cache.clear()
+        Template("{% component 'sub_component_sub.html' %}{% endcomponent %}").render(Context({}))
+        self.assertIn('sub_component_sub.html', cache.templates)
+
+        template = Template("{% component name %}{% endcomponent %}")
+        template.render(Context({'name': 'sub_component_sub2.html'}))
+        self.assertIn('sub_component_sub2.html', cache.recent)
+        self.assertNotIn('sub_component_sub2.html', cache.templates)
+
+    def test_component_template_cache_without_cached_loader(self):
+        import tempfile
+        from mixin_templatetag.templatecache import get_template_cache
+
+        with tempfile.TemporaryDirectory() as templates:
+            def write(name, source):
+                with open(os.path.join(templates, name), 'w') as fp:
+                    fp.write(source)
+
+            # Like debug before Django 4.1: templates are read on every render.
+            engine = Engine(dirs=[templates], debug=True, loaders=['django.template.loaders.filesystem.Loader'],
+                            builtins=['mixin_templatetag.templatetags.mixins'])
+            write('library.html', "{% mixin badge %}<b>{{ label }}</b>{% endmixin %}")
+            write('card.html', "{% load_mixins 'library.html' %}<div>{% mix badge with label='a' %}</div>")
+            write('page.html', "{% component 'card.html' %}{% endcomponent %}")
+            self.assertHTMLEqual(engine.get_template('page.html').render(Context()), '<div><b>a</b></div>')
+
+            write('library.html', "{% mixin badge %}<i>{{ label }}</i>{% endmixin %}")
+            self.assertHTMLEqual(engine.get_template('page.html').render(Context()), '<div><i>a</i></div>')
+            write('card.html', "<p>card</p>")
+            self.assertHTMLEqual(engine.get_template('page.html').render(Context()), '<p>card</p>')
+            cache = get_template_cache(engine)
+            self.assertEqual(cache.templates, {})
+            self.assertEqual(cache.mixin_libraries, {})
+
+    def test_component_template_cache_bounded(self):
+        from mixin_templatetag.templatecache import ComponentTemplateCache
+
+        cache = ComponentTemplateCache(Engine.get_default(), maxsize=1)
+        cache.get_template('sub_component_sub.html', literal=False)
+        cache.get_template('sub_component_sub2.html', literal=False)
+        self.assertEqual(len(cache.recent), 1)
+        self.assertIn('sub_component_sub2.html', cache.recent)
+
+    def test_component_template_cache_autoreload(self):
+        from pathlib import Path
+        from mixin_templatetag.templatecache import file_changed, get_template_cache
+
+        if file_changed is None:
+            self.skipTest("Django's autoreloader has no file_changed signal before 2.2")
+        cache = get_template_cache(Engine.get_default())
+        cache.get_template('sub_component_sub.html')
+        cache.get_template('sub_component_sub2.html')
+        file_changed.send(sender=None, file_path=Path(BASE_DIR, 'templates', 'sub_component_sub.html'))
+        self.assertEqual(list(cache.templates), ['sub_component_sub2.html'])
+        # Files outside of the template directories may still be templates.
+        file_changed.send(sender=None, file_path=Path(BASE_DIR, 'other.html'))
+        self.assertEqual(cache.templates, {})
+
+    def test_component_must_not_extend(self):
+        template = Template("{% component 'component_extends.html' %}{% endcomponent %}")
+        with self.assertRaises(TemplateSyntaxError):
+            template.render(Context({}))
+
+    def test_component_layout(self):
+        from mixin_templatetag.componentnodes import get_component_layout
+        from mixin_templatetag.templatecache import get_template_cache
+
+        cache = get_template_cache(Engine.get_default())
+        layout = get_component_layout(cache.get_template('sub_component_main.html'))
+        self.assertEqual({slot.name for slot in layout.memoized}, {'main_slot'})
+        self.assertIs(layout, get_component_layout(cache.get_template('sub_component_main.html')))
+        layout = get_component_layout(cache.get_template('component.html'))
+        self.assertEqual({slot.name for slot in layout.memoized}, {'foo', 'bar'})
+        # The slot in the for loop renders in another context for each item.
+        layout = get_component_layout(cache.get_template('slot_twice.html'))
+        self.assertEqual(len(layout.memoized), 2)
+
+    def test_slot_overrides_are_scoped(self):
+        template = Template("""
+            {% for i in '123' %}
+                {% component 'nested_same_slot.html' %}
+                    {% slot title %}title {{ i }}{% endslot %}
+                {% endcomponent %}
+            {% endfor %}
+            {% component 'sub_component_sub2.html' %}{% endcomponent %}
+        """)
+        rendered = template.render(Context({}))
+        self.assertHTMLEqual(rendered, """
+            <section>title 1<span>title 1</span></section>
+            <section>title 2<span>title 2</span></section>
+            <section>title 3<span>title 3</span></section>
+            <span>default sub2_slot</span>
+        """)
+
+    def test_slot_context_stacks(self):
+        from mixin_templatetag.componentnodes import SlotContext
+
+        slot_context = SlotContext()
+        slot_context.add_slots({'a': 'outer'})
+        slot_context.add_slots({'a': 'inner', 'b': 'inner'})
+        # The outer override wins, the inner one is next down.
+        self.assertEqual(slot_context.get_slot('a'), 'outer')
+        self.assertEqual(slot_context.get_slot('b'), 'inner')
+        self.assertEqual(slot_context.pop('a'), 'outer')
+        self.assertEqual(slot_context.get_slot('a'), 'inner')
+        slot_context.push('a', 'outer')
+        slot_context.remove_slots({'a': 'inner', 'b': 'inner'})
+        self.assertEqual(slot_context.get_slot('a'), 'outer')
+        self.assertIsNone(slot_context.get_slot('b'))
+        slot_context.remove_slots({'a': 'outer'})
+        self.assertEqual(slot_context.slots, {})
+
+    def test_slot_super(self):
+        template = Template("""
+            {% component 'sub_component_sub2.html' %}
+                {% slot sub2_slot %}{{ slot.name }}: {{ slot.super }}!{% endslot %}
+            {% endcomponent %}
+        """)
+        rendered = template.render(Context({}))
+        self.assertHTMLEqual(rendered, "<span>sub2_slot: default sub2_slot!</span>")
+
+    def test_slot_super_in_base_template(self):
+        template = Template("{% slot foo %}{{ slot.super }}{% endslot %}")
+        with self.assertRaises(TemplateSyntaxError):
+            template.render(Context({}))
+
+    def test_mix_cached(self):
+        from unittest import mock
+        from django.utils import translation
+        from mixin_templatetag.mixinnodes import MixNode
+
+        template = Template("""
+            {% load i18n %}
+            {% mixin foo %}<b>{{ name }}</b>{% trans 'Yes' %}{% endmixin %}
+            {% for i in '1234' %}{% mix foo with name="hello" only cached %}{% endfor %}
+            {% mix foo with name=2 only cached %}
+        """)
+        render_values = MixNode.render_values
+        with mock.patch.object(MixNode, 'render_values', autospec=True, side_effect=render_values) as rendered:
+            self.assertHTMLEqual(template.render(Context()), "<b>hello</b>Yes" * 4 + "<b>2</b>Yes")
+            self.assertEqual(rendered.call_count, 2)
+            # Other languages get entries of their own.
+            with translation.override('de'):
+                self.assertHTMLEqual(template.render(Context()), "<b>hello</b>Ja" * 4 + "<b>2</b>Ja")
+            self.assertEqual(rendered.call_count, 4)
+
+    def test_mix_cached_requires_only(self):
+        with self.assertRaises(TemplateSyntaxError):
+            Template("{% mixin foo %}{{ name }}{% endmixin %}{% mix foo with name='a' cached %}")
+        # Values from the context may be equal and still render differently.
+        for value in ('name', 'name.pk', '"a"|upper'):
+            with self.subTest(value=value), self.assertRaises(TemplateSyntaxError):
+                Template("{%% mixin foo %%}{{ name }}{%% endmixin %%}{%% mix foo with name=%s only cached %%}" % value)
+
+    def test_component_cache(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        template = Template("""
+            {% component 'sub_component_sub2.html' with value=value cache 300 vary_on key %}
+                {% slot sub2_slot %}{{ value }}{% endslot %}
+            {% endcomponent %}
+        """)
+        self.assertHTMLEqual(template.render(Context({'key': 1, 'value': 'a'})), '<span>a</span>')
+        self.assertHTMLEqual(template.render(Context({'key': 1, 'value': 'b'})), '<span>a</span>')
+        self.assertHTMLEqual(template.render(Context({'key': 2, 'value': 'b'})), '<span>b</span>')
+
+        # Different slot overrides don't share cache entries.
+        template = Template("""
+            {% component 'sub_component_sub2.html' with value=value cache 300 vary_on key %}
+                {% slot sub2_slot %}[{{ value }}]{% endslot %}
+            {% endcomponent %}
+        """)
+        self.assertHTMLEqual(template.render(Context({'key': 1, 'value': 'c'})), '<span>[c]</span>')
+
+    def test_component_cache_outer_overrides(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        template = Template("""
+            {% component 'cached_sub2.html' %}{% slot sub2_slot %}{{ title }}{% endslot %}{% endcomponent %}
+            {% component 'cached_sub2.html' %}{% slot sub2_slot %}[{{ title }}]{% endslot %}{% endcomponent %}
+            {% component 'cached_sub2.html' %}{% endcomponent %}
+        """)
+        # Like vary_on, what the overrides render doesn't change the key.
+        self.assertHTMLEqual(template.render(Context({'title': 'one'})), """
+            <span>one</span><span>[one]</span><span>default sub2_slot</span>
+        """)
+        self.assertHTMLEqual(template.render(Context({'title': 'two'})), """
+            <span>one</span><span>[one]</span><span>default sub2_slot</span>
+        """)
+
+    def test_component_cache_options(self):
+        with self.assertRaises(TemplateSyntaxError):
+            Template("{% component 'sub_component_sub2.html' vary_on key %}{% endcomponent %}")
+        with self.assertRaises(TemplateSyntaxError):
+            Template("{% component 'sub_component_sub2.html' cache %}{% endcomponent %}")
+        with self.assertRaises(TemplateSyntaxError):
+            Template("{% component 'sub_component_sub2.html' cache 'soon' %}{% endcomponent %}").render(Context({}))
+
+    def test_load_mixins(self):
+        from mixin_templatetag.mixinnodes import MixNode
+        from mixin_templatetag.templatecache import get_template_cache
+
+        engine = Engine.get_default()
+        template = engine.get_template('load_mixins.html')
+        self.assertHTMLEqual(template.render(Context({})), '<ul><li>one</li><li>two</li></ul>')
+
+        other = Template("""
+            {% load_mixins 'mixins/library.html' %}
+            {% mix badge with label='new' %}
+        """)
+        self.assertHTMLEqual(other.render(Context({})), '<b>new</b>')
+        # The compiled mixins are shared, not copied.
+        item = template.nodelist.get_nodes_by_type(MixNode)[0]
+        badge = other.nodelist.get_nodes_by_type(MixNode)[0]
+        library = get_template_cache(engine).get_template('mixins/library.html')
+        self.assertIs(badge.nodelist, library.nodelist[0].nodelist)
+        self.assertIs(item.nodelist, library.nodelist[2].nodelist)
+
+        # Strings compiled by an engine outside of TEMPLATES can't tell which
+        # loaders to use; its templates can.
+        engine = Engine(dirs=[os.path.join(BASE_DIR, 'templates')], builtins=['mixin_templatetag.templatetags.mixins'])
+        with self.assertRaisesMessage(TemplateSyntaxError, "can't find the engine of a template built from a string"):
+            engine.from_string("{% load_mixins 'mixins/library.html' %}")
+        template = engine.get_template('load_mixins.html')
+        self.assertHTMLEqual(template.render(Context({})), '<ul><li>one</li><li>two</li></ul>')
+
+    def test_load_mixins_requires_literal(self):
+        with self.assertRaises(TemplateSyntaxError):
+            Template("{% load_mixins library %}")
+
+    def test_stream_template(self):
+        from django.template import engines
+        from mixin_templatetag.streaming import stream_template
+
+        engine = Engine.get_default()
+        context = dict(my_var='yes')
+        template = engine.get_template('content.html')
+        chunks = list(stream_template(template, Context(context), buffer_size=1))
+        self.assertGreater(len(chunks), 6)
+        self.assertEqual(''.join(chunks), template.render(Context(context)))
+
+        template = Template("""
+            {% mixin foo %}<b>{{ name }}</b>{% endmixin %}
+            {% mix foo with name="a" %}{% mix foo with name="b" only %}
+            {% component 'sub_component_main.html' %}
+                {% slot main_slot %}{{ slot.super }}!{% endslot %}
+            {% endcomponent %}
+        """)
+        self.assertEqual(''.join(stream_template(template)), template.render(Context({})))
+
+        # Components looped over with for, and inside if and with, stream too.
+        template = Template("""
+            {% for i in items %}{% if i %}{% with value=i %}
+                {% component 'sub_component_sub2.html' %}{% slot sub2_slot %}{{ value }}{% endslot %}{% endcomponent %}
+            {% endwith %}{% endif %}{% empty %}none{% endfor %}
+        """)
+        loop_context = Context({'items': range(100)})
+        chunks = list(stream_template(template, loop_context, buffer_size=1))
+        self.assertGreater(len(chunks), 99 * 3)
+        self.assertEqual(''.join(chunks), template.render(Context({'items': range(100)})))
+        self.assertEqual(''.join(stream_template(template, Context({'items': []}))).strip(), 'none')
+        self.assertNotIn('forloop', loop_context)
+
+        backend_template = engines['django'].get_template('content.html')
+        chunks = list(stream_template(backend_template, context))
+        self.assertEqual(''.join(chunks), backend_template.render(context))
+
+    def test_arender_template(self):
+        from mixin_templatetag.asyncrender import arender_template
+
+        started = []
+
+        async def fetch(value):
+            started.append(value)
+            await asyncio.sleep(0)
+            # Both fetches have started before either finishes.
+            self.assertEqual(len(started), 2)
+            return value
+
+        template = Template("""
+            {% mixin foo %}<b>{{ name }}</b>{% endmixin %}
+            {% component 'sub_component_sub2.html' with value=first %}
+                {% slot sub2_slot %}{{ value }}{% endslot %}
+            {% endcomponent %}
+            {% mix foo with name=second only %}
+        """)
+        context = Context({'first': fetch('first'), 'second': fetch('second')})
+        rendered = run_async(arender_template(template, context))
+        self.assertHTMLEqual(rendered, '<span>first</span><b>second</b>')
+        self.assertEqual(started, ['first', 'second'])
+
+        template = Engine.get_default().get_template('content.html')
+        self.assertEqual(
+            run_async(arender_template(template, Context({'my_var': 'yes'}))),
+            template.render(Context({'my_var': 'yes'})),
+        )
+
+    def test_arender_template_nested_tags(self):
+        from mixin_templatetag.asyncrender import arender_template
+
+        async def fetch(value):
+            await asyncio.sleep(0)
+            return value
+
+        template = Template("""
+            {% mixin foo %}<b>{{ name }}</b>{% endmixin %}
+            {% if show %}{% mix foo with name=first %}{% else %}no{% endif %}
+            {% for item in items %}{% mix foo with name=item only %}{{ forloop.counter }}{% endfor %}
+            {% for a, b in pairs %}{% mix foo with name=a %}{{ b }}{% empty %}empty{% endfor %}
+            {% with value=second %}{% component 'sub_component_sub2.html' with value=value %}
+                {% slot sub2_slot %}{{ value }}{% endslot %}
+            {% endcomponent %}{% endwith %}
+        """)
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            rendered = run_async(arender_template(template, Context({
+                'show': True, 'first': fetch('a'), 'items': [fetch('b'), fetch('c')],
+                'pairs': [], 'second': fetch('d'),
+            })))
+        self.assertHTMLEqual(rendered, '<b>a</b><b>b</b>1<b>c</b>2 empty<span>d</span>')
+
+        context = {'show': False, 'items': [], 'pairs': [('x', 1), ('y', 2)], 'second': 'e'}
+        self.assertEqual(
+            run_async(arender_template(template, Context(context))),
+            template.render(Context(context)),
+        )
+
+    def test_render_stats(self):
+        from mixin_templatetag import stats
+
+        received = []
+
+        def receiver(sender, **kwargs):
+            received.append((kwargs['kind'], kwargs['name']))
+
+        template = Template("""
+            {% mixin foo %}<b>{{ name }}</b>{% endmixin %}
+            {% component 'sub_component_main.html' %}
+                {% slot main_slot %}{% mix foo with name='x' %}{% endslot %}
+            {% endcomponent %}
+        """)
+        stats.reset()
+        stats.enable()
+        stats.node_rendered.connect(receiver)
+        try:
+            template.render(Context({}))
+        finally:
+            stats.disable()
+            stats.node_rendered.disconnect(receiver)
+
+        results = {(stat['kind'], stat['name']): stat for stat in stats.get_stats()}
+        self.assertEqual(set(results), {
+            ('component', 'sub_component_main.html'), ('component', 'sub_component_sub.html'),
+            ('slot', 'main_slot'), ('slot', 'sub_slot'), ('mix', 'foo'),
+        })
+        self.assertEqual(set(received), set(results))
+        main = results['component', 'sub_component_main.html']
+        self.assertEqual(main['calls'], 1)
+        self.assertLess(main['self_time'], main['total_time'])
+        self.assertEqual(results['mix', 'foo']['output_size'], len('<b>x</b>'))
+
+        stats.reset()
+        template.render(Context({}))
+        self.assertEqual(stats.get_stats(), [])
+
+    def test_component_for(self):
+        template = Template("""
+            {% component_for item in items 'sub_component_sub2.html' with prefix=prefix label=item|upper %}
+                {% slot sub2_slot %}{{ prefix }}{{ label }}{{ forloop.counter }}{% if forloop.last %}!{% endif %}{% endslot %}
+            {% endcomponent_for %}
+        """)
+        rendered = template.render(Context({'items': ['a', 'b', 'c'], 'prefix': '-'}))
+        self.assertHTMLEqual(rendered, '<span>-A1</span><span>-B2</span><span>-C3!</span>')
+        self.assertEqual(template.render(Context({'items': []})).strip(), '')
+
+        # With only, the loop variables and forloop are only seen when passed.
+        template = Template("""
+            {% component_for key, value in pairs 'sub_component_sub2.html' with key=key number=value other=other only %}
+                {% slot sub2_slot %}{{ key }}={{ number }}{{ value }}{{ other }}{{ outside }}{{ forloop.counter }}{% endslot %}
+            {% endcomponent_for %}
+        """)
+        rendered = template.render(Context({'pairs': [('a', 1), ('b', 2)], 'other': ';', 'outside': 'x'}))
+        self.assertHTMLEqual(rendered, '<span>a=1;</span><span>b=2;</span>')
+        with self.assertRaises(ValueError):
+            template.render(Context({'pairs': [('a', 1, 2)]}))
+
+    def test_component_for_syntax(self):
+        with self.assertRaises(TemplateSyntaxError):
+            Template("{% component_for item items 'sub_component_sub2.html' %}{% endcomponent_for %}")
+        with self.assertRaises(TemplateSyntaxError):
+            Template("{% component_for item in items %}{% endcomponent_for %}")
+        with self.assertRaises(TemplateSyntaxError):
+            Template("{% component_for item in items 'sub_component_sub2.html' %}text{% endcomponent_for %}")
+
+    def test_mix_inline(self):
+        from mixin_templatetag.mixinnodes import InlineMixNode, MixNode
+
+        template = Template("""
+            {% mixin cell %}<td>{% for c in name %}{{ c }}{% endfor %}</td>{% endmixin %}
+            {% mixin row %}<td>{{ name }}</td>{% if name %}{% mix cell %}{% endif %}{% endmixin %}
+            {% mixin setter %}{% cycle 'a' 'b' as letter %}{% endmixin %}
+            {% mix row %}{% mix row with name='x' %}{% mix setter %}[{{ letter }}]
+        """)
+        result = template.render(Context({'name': 'ab'}))
+        self.assertHTMLEqual(result, '<td>ab</td><td>ab</td><td>x</td><td>x</td>a[]')
+
+        # Mixes of the cell mixin are still found inside both row mixes.
+        mixes = template.nodelist.get_nodes_by_type(MixNode)
+        self.assertEqual(
+            [(type(node), node.name) for node in mixes],
+            [(InlineMixNode, 'row'), (InlineMixNode, 'cell'), (MixNode, 'row'), (InlineMixNode, 'cell'),
+             (MixNode, 'setter')],
+        )
+
+    def test_precompile_templates(self):
+        import tempfile
+        from io import StringIO
+        from django.core.management import CommandError, call_command
+        from mixin_templatetag.precompile import precompile_templates
+        from mixin_templatetag.templatecache import get_template_cache
+
+        engine = Engine.get_default()
+        results = {result.template_name: result for result in precompile_templates(engine)}
+        self.assertIn('mixins/library.html', results)
+        self.assertNotIn('base.html', results)
+        self.assertEqual([name for name, result in results.items() if result.error], [])
+        self.assertIn('sub_component_sub2.html', get_template_cache(engine).templates)
+
+        with tempfile.TemporaryDirectory() as directory:
+            for name, source in (
+                ('base.html', "{% block content %}{% endblock %}"),
+                ('extends.html', "{% extends 'base.html' %}"),
+                ('page.html', "{% component 'extends.html' %}{% endcomponent %}"),
+                ('missing.html', "{% component 'missing_component.html' %}{% endcomponent %}"),
+                ('bad.html', "{% component 'extends.html' %}text{% endcomponent %}"),
+            ):
+                with open(os.path.join(directory, name), 'w') as fp:
+                    fp.write(source)
+
+            templates = [{
+                'BACKEND': 'django.template.backends.django.DjangoTemplates',
+                'DIRS': [directory],
+                'OPTIONS': {'builtins': ['mixin_templatetag.templatetags.mixins']},
+            }]
+            with override_settings(TEMPLATES=templates):
+                stdout, stderr = StringIO(), StringIO()
+                with self.assertRaisesMessage(CommandError, '3 templates failed to compile.'):
+                    call_command('precompile_templates', stdout=stdout, stderr=stderr)
+                errors = stderr.getvalue()
+                self.assertIn('page.html: Component template', errors)
+                self.assertIn('missing.html: missing_component.html', errors)
+                self.assertIn('bad.html:', errors)
+                self.assertIn("Compiled 3 templates for 'django'", stdout.getvalue())
+
+                with self.assertRaises(CommandError):
+                    call_command('precompile_templates', engine=['other'], stdout=stdout, stderr=stderr)
+
+    def test_template_dependencies(self):
+        import tempfile
+        from mixin_templatetag.templatecache import get_template_cache
+
+        with tempfile.TemporaryDirectory() as directory:
+            def write(name, source):
+                with open(os.path.join(directory, name), 'w') as fp:
+                    fp.write(source)
+
+            write('card.html', "<div>{% slot body %}{% endslot %}</div>")
+            write('library.html', "{% mixin badge %}<b>{{ label }}</b>{% endmixin %}")
+            write('page.html', """{% load_mixins 'library.html' %}
+                {% component 'card.html' %}{% slot body %}{% mix badge with label='a' %}{% endslot %}{% endcomponent %}
+            """)
+            write('list.html', "{% component_for item in items 'card.html' %}{% endcomponent_for %}")
+            engine = Engine(dirs=[directory], loaders=[
+                ('django.template.loaders.cached.Loader', ['django.template.loaders.filesystem.Loader']),
+            ], builtins=['mixin_templatetag.templatetags.mixins'])
+            cache = get_template_cache(engine)
+
+            self.assertHTMLEqual(engine.get_template('page.html').render(Context()), '<div><b>a</b></div>')
+            engine.get_template('list.html')
+            self.assertEqual(cache.get_dependents('card.html'), {'page.html', 'list.html'})
+            self.assertEqual(cache.get_dependents('library.html', 'mixins'), {'page.html'})
+            self.assertEqual(cache.get_dependencies('page.html'), {'card.html', 'library.html'})
+            self.assertEqual(cache.get_dependencies('page.html', 'component'), {'card.html'})
+
+            # A component is looked up when it renders, so only it is dropped.
+            write('card.html', "<p>{% slot body %}{% endslot %}</p>")
+            self.assertEqual(cache.invalidate('card.html'), {'card.html'})
+            self.assertHTMLEqual(engine.get_template('page.html').render(Context()), '<p><b>a</b></p>')
+
+            # The mixins of a library are copied into the templates loading it.
+            write('library.html', "{% mixin badge %}<i>{{ label }}</i>{% endmixin %}")
+            self.assertEqual(cache.invalidate('library.html'), {'library.html', 'page.html'})
+            self.assertEqual(cache.get_dependents('library.html'), set())
+            self.assertHTMLEqual(engine.get_template('page.html').render(Context()), '<p><i>a</i></p>')
+            self.assertEqual(cache.get_dependents('library.html'), {'page.html'})
+
+    def test_slot_rendered_once(self):
+        from mixin_templatetag.asyncrender import arender_template
+        from mixin_templatetag.streaming import stream_template
+
+        class Counter:
+            calls = 0
+
+            def __call__(self):
+                self.calls += 1
+                return self.calls
+
+        template = Template("""
+            {% component 'slot_twice.html' %}{% slot title %}{{ count }}{% endslot %}{% endcomponent %}
+        """)
+        expected = '<h1>1</h1><p>1</p><i>2</i><i>3</i>'
+        self.assertHTMLEqual(template.render(Context({'count': Counter()})), expected)
+        self.assertHTMLEqual(''.join(stream_template(template, Context({'count': Counter()}))), expected)
+        self.assertHTMLEqual(run_async(arender_template(template, Context({'count': Counter()}))), expected)
+
+        template = Template("""
+            {% component 'slot_twice.html' %}{% slot title rerender %}{{ count }}{% endslot %}{% endcomponent %}
+        """)
+        self.assertHTMLEqual(template.render(Context({'count': Counter()})), '<h1>1</h1><p>2</p><i>3</i><i>4</i>')
+
+        # Each item of component_for is a component of its own.
+        template = Template("""
+            {% component_for x in 'ab' 'slot_twice.html' %}{% slot title %}{{ count }}{% endslot %}{% endcomponent_for %}
+        """)
+        self.assertHTMLEqual(
+            template.render(Context({'count': Counter()})),
+            '<h1>1</h1><p>1</p><i>2</i><i>3</i><h1>4</h1><p>4</p><i>5</i><i>6</i>',
+        )
+
+        # Unused overrides aren't rendered at all.
+        counter = Counter()
+        Template("""
+            {% component 'slot_twice.html' %}{% slot unused %}{{ count }}{% endslot %}{% endcomponent %}
+        """).render(Context({'count': counter}))
+        self.assertEqual(counter.calls, 0)
+
+        with self.assertRaises(TemplateSyntaxError):
+            Template("{% slot title again %}{% endslot %}")
+
+    def test_component_dedupe(self):
+        from unittest import mock
+        from mixin_templatetag.asyncrender import arender_template
+        from mixin_templatetag.componentnodes import ComponentNode
+
+        template = Template("""
+            {% for i in '123' %}
+                {% component 'sub_component_sub2.html' with value=name only dedupe %}{% endcomponent %}
+            {% endfor %}
+            {% component 'sub_component_sub2.html' with value=other only dedupe %}{% endcomponent %}
+            {% component 'sub_component_sub2.html' with value=name only dedupe %}
+                {% slot sub2_slot %}[{{ value }}]{% endslot %}
+            {% endcomponent %}
+            {% component 'sub_component_sub2.html' with value=names only dedupe %}{% endcomponent %}
+        """)
+        context = {'name': 'a', 'other': 'b', 'names': ['c']}
+        expected = "<span>default sub2_slot</span>" * 4 + "<span>[a]</span><span>default sub2_slot</span>"
+        render_parent = ComponentNode.render_parent
+        with mock.patch.object(ComponentNode, 'render_parent', autospec=True, side_effect=render_parent) as rendered:
+            self.assertHTMLEqual(template.render(Context(context)), expected)
+            self.assertEqual(rendered.call_count, 4)
+            # Nothing is kept between renders.
+            self.assertHTMLEqual(template.render(Context(context)), expected)
+            self.assertEqual(rendered.call_count, 8)
+
+        arender_parent = ComponentNode.arender_parent
+        with mock.patch.object(ComponentNode, 'arender_parent', autospec=True, side_effect=arender_parent) as rendered:
+            self.assertHTMLEqual(run_async(arender_template(template, Context(context))), expected)
+            # Like the sync render, the last one without overrides reuses the
+            # output of the components in the for loop.
+            self.assertEqual(rendered.call_count, 4)
+
+        with self.assertRaises(TemplateSyntaxError):
+            Template("{% component 'sub_component_sub2.html' with value=name dedupe %}{% endcomponent %}")
+
+    def test_isolated_context(self):
+        from django.http import HttpRequest
+        from unittest import mock
+        from django.template import RequestContext
+        from mixin_templatetag.utils import IsolatedContext, isolate_context
+
+        calls = []
+
+        def processor(request):
+            calls.append(request)
+            return {'processed': 'yes'}
+
+        request = HttpRequest()
+        template = Template("""
+            {% mixin show %}{{ value }}{{ processed }}{{ outside }}{% endmixin %}
+            {% mix show with value='a' only %}
+            {% component 'sub_component_sub2.html' with value='b' only %}
+                {% slot sub2_slot %}{{ value }}{{ processed }}{{ outside }}{% endslot %}
+            {% endcomponent %}
+        """)
+        context = RequestContext(request, {'outside': 'x'}, processors=[processor])
+        self.assertHTMLEqual(template.render(context), 'a<span>b</span>')
+        self.assertEqual(calls, [request])
+
+        isolated = []
+
+        def isolate(context, values):
+            isolated.append(isolate_context(context, values))
+            return isolated[-1]
+
+        with mock.patch('mixin_templatetag.mixinnodes.isolate_context', isolate):
+            Template("{% mixin a %}{{ a }}{% endmixin %}{% mix a only %}").render(context)
+        self.assertIsInstance(isolated[0], IsolatedContext)
+        self.assertIs(isolated[0].request, request)
+        self.assertIs(isolated[0].render_context, context.render_context)
+
+    def test_footprint(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from django.template import Node
+        from mixin_templatetag.footprint import template_footprint
+        from mixin_templatetag.templatetags.mixins import EMPTY_NODELIST
+        from mixin_templatetag.utils import EMPTY_MAPPING
+
+        template = Template("{% component 'sub_component_sub2.html' %} {% endcomponent %}")
+        node = template.nodelist[0]
+        self.assertIs(node.slots, EMPTY_MAPPING)
+        self.assertIs(node.extra_context, EMPTY_MAPPING)
+        self.assertIs(node.nodelist, EMPTY_NODELIST)
+
+        template = Template("""
+            {% mixin a %}{{ value }}{% endmixin %}
+            {% mix a with value=1 %}
+            {% component 'sub_component_sub2.html' %}
+                {% slot sub2_slot %}{% mix a %}{% endslot %}
+            {% endcomponent %}
+        """)
+        footprint = template_footprint(template)
+        self.assertEqual(footprint['counts'], {
+            'MixinNode': 1, 'MixNode': 1, 'InlineMixNode': 1, 'ComponentNode': 1, 'SlotNode': 1,
+        })
+        self.assertEqual(footprint['nodes'], 5)
+        self.assertEqual(footprint['total'], sum(footprint['sizes'].values()))
+        self.assertGreater(footprint['sizes']['ComponentNode'], 0)
+        # Every attribute of the nodes, including those set by the parser and
+        # while rendering, is a slot.
+        template.render(Context({}))
+        for node in template.nodelist.get_nodes_by_type(Node):
+            if type(node).__module__.startswith('mixin_templatetag.'):
+                self.assertEqual(vars(node), {})
+
+        stdout = StringIO()
+        call_command('precompile_templates', memory=True, stdout=stdout)
+        self.assertIn('sub_component_sub2.html: ', stdout.getvalue())
+        self.assertIn('Total: ', stdout.getvalue())
+
+    def test_parse_errors(self):
+        for source, message in (
+            ("{% mix a %}", "'mix' tag with mixin 'a' cannot be found."),
+            ("{% mixin a %}{% endmixin %}{% mixin a %}{% endmixin %}", "'mixin' tag with name 'a' appears more than once"),
+            ("{% mixin a %}{% mix a %}{% endmixin %}", "'mix' tag with mixin 'a' cannot be found."),
+            ("{% mixin a %}{% endmixin %}{% mix a only only %}", "The 'only' option was specified more than once."),
+            ("{% mixin a %}{% endmixin %}{% mix a with %}", '"with" in \'mix\' tag needs at least one keyword argument.'),
+            ("{% mixin a %}{% endmixin %}{% mix a with b=1 c %}", "Unknown argument for 'mix' tag: 'c'."),
+            ("{% component 'sub_component_sub2.html' cache %}{% endcomponent %}", "'cache' in 'component' tag needs a value."),
+            ("{% component 'sub_component_sub2.html' cache 1 vary_on %}{% endcomponent %}",
+             '"vary_on" in \'component\' tag needs at least one value.'),
+        ):
+            with self.subTest(source=source), self.assertRaisesMessage(TemplateSyntaxError, message):
+                Template(source)
+
+        template = Template("""
+            {% mixin a %}{{ b }}{{ c }}{% endmixin %}
+            {% mix a with b=1 c="2" only %}
+            {% component 'sub_component_sub2.html' with value=3 cache 10 vary_on b c only %}{% endcomponent %}
+        """)
+        mix, component = template.nodelist[3], template.nodelist[5]
+        self.assertEqual(sorted(mix.extra_context), ['b', 'c'])
+        self.assertEqual(len(component.vary_on), 2)
+        self.assertTrue(component.isolated_context)
+        self.assertHTMLEqual(template.render(Context()), '12<span>default sub2_slot</span>')
+
+    def test_static_bodies(self):
+        from unittest import mock
+        from mixin_templatetag.asyncrender import arender_template
+        from mixin_templatetag.componentnodes import ComponentNode
+        from mixin_templatetag.mixinnodes import InlineMixNode, MixNode, StaticMixNode
+        from mixin_templatetag.streaming import stream_template
+
+        source = """
+            {% mixin label %} <b>static</b>  {% comment %}x{% endcomment %}{% endmixin %}
+            {% mixin name %}<b>{{ name }}</b>{% endmixin %}
+            {% mix label %}{% mix label with a=missing.value only %}{% mix name %}
+            {% component 'sub_component_main.html' %}
+                {% slot main_slot %}  my   way  {% endslot %}
+            {% endcomponent %}
+        """
+        template = Template(source)
+        mixes = [(type(node), node.name) for node in template.nodelist.get_nodes_by_type(MixNode)]
+        self.assertEqual(mixes, [(StaticMixNode, 'label'), (StaticMixNode, 'label'), (InlineMixNode, 'name')])
+        component = template.nodelist.get_nodes_by_type(ComponentNode)[0]
+        self.assertEqual(component.slots['main_slot'].static, '  my   way  ')
+        self.assertIsNone(Template("{% slot a %}{{ a }}{% endslot %}").nodelist[0].static)
+
+        expected = template.render(Context({'name': 'n'}))
+        self.assertHTMLEqual(expected, """
+            <b>static</b> <b>static</b> <b>n</b>
+            <div>my way <p>custom sub_slot</p></div>
+        """)
+        self.assertEqual(''.join(stream_template(template, Context({'name': 'n'}))), expected)
+        self.assertEqual(run_async(arender_template(template, Context({'name': 'n'}))), expected)
+
+        # Static slots and mixes never touch the context.
+        with mock.patch.object(Context, 'push') as push:
+            Template("{% mixin a %}a{% endmixin %}{% mix a with b=1 %}{% slot s %}s{% endslot %}").render(Context())
+        push.assert_not_called()
+
+        with self.settings(MIXIN_TEMPLATETAG_COLLAPSE_WHITESPACE=True):
+            template = Template(source)
+        component = template.nodelist.get_nodes_by_type(ComponentNode)[0]
+        self.assertEqual(component.slots['main_slot'].static, ' my way ')
+        self.assertIn(' <b>static</b> ', template.render(Context()))
+
+    def test_disk_cache(self):
+        import tempfile
+        from unittest import mock
+        from django.template.base import Parser
+        from mixin_templatetag.templatecache import get_template_cache
+
+        with tempfile.TemporaryDirectory() as templates, tempfile.TemporaryDirectory() as cache_dir:
+            def write(name, source):
+                with open(os.path.join(templates, name), 'w') as fp:
+                    fp.write(source)
+
+            def render(t):
+                engine = Engine(dirs=[templates], builtins=['mixin_templatetag.templatetags.mixins'])
+                page = engine.from_string("""
+                    {% component 'card.html' with title=t %}{% slot body %}[{{ t }}]{% endslot %}{% endcomponent %}
+                """)
+                return engine, page.render(Context({'t': t}))
+
+            write('library.html', "{% mixin badge %}<b>{{ label }}</b>{% endmixin %}{% mixin star %}*{% endmixin %}")
+            write('card.html', """{% load_mixins 'library.html' %}
+                <div>
+                    {% if title == 'x' and not hidden %}{% mix badge with label=title %}{% endif %}
+                    {% slot body %}{% endslot %}{% mix star %}
+                </div>
+            """)
+
+            def count_entries():
+                return len([name for name in os.listdir(cache_dir) if name.endswith('.pickle')])
+
+            with self.settings(MIXIN_TEMPLATETAG_DISK_CACHE_DIR=cache_dir):
+                engine, output = render('x')
+                self.assertHTMLEqual(output, '<div><b>x</b>[x]*</div>')
+                self.assertEqual(count_entries(), 2)
+
+                # A new engine loads both templates without parsing them.
+                parsed = set()
+
+                def parse(parser, *args, **kwargs):
+                    parsed.add(parser.origin.name)
+                    return original_parse(parser, *args, **kwargs)
+
+                original_parse = Parser.parse
+                with mock.patch.object(Parser, 'parse', parse):
+                    engine, output = render('x')
+                self.assertEqual(parsed, {'<unknown source>'})  # the page
+                self.assertHTMLEqual(output, '<div><b>x</b>[x]*</div>')
+                cache = get_template_cache(engine)
+                self.assertEqual(cache.get_dependents('library.html'), {'card.html'})
+                card = cache.get_template('card.html')
+                self.assertIs(card.engine, engine)
+                self.assertIs(card.nodelist[0].origin, card.origin)
+                self.assertEqual(card.origin.name, os.path.join(templates, 'card.html'))
+
+                # Another cache version misses every entry.
+                with self.settings(MIXIN_TEMPLATETAG_DISK_CACHE_VERSION='2'):
+                    parsed.clear()
+                    with mock.patch.object(Parser, 'parse', parse):
+                        self.assertHTMLEqual(render('x')[1], '<div><b>x</b>[x]*</div>')
+                    self.assertIn(os.path.join(templates, 'card.html'), parsed)
+                    self.assertEqual(count_entries(), 4)
+
+                # Changing the library makes the cached card stale.
+                write('library.html', "{% mixin badge %}<i>{{ label }}</i>{% endmixin %}{% mixin star %}+{% endmixin %}")
+                self.assertHTMLEqual(render('x')[1], '<div><i>x</i>[x]+</div>')
+                write('card.html', "<p>{% slot body %}{% endslot %}</p>")
+                self.assertHTMLEqual(render('y')[1], '<p>[y]</p>')
+
+                # Broken entries are parsed again and replaced.
+                for name in os.listdir(cache_dir):
+                    with open(os.path.join(cache_dir, name), 'wb') as fp:
+                        fp.write(b'broken')
+                self.assertHTMLEqual(render('y')[1], '<p>[y]</p>')
+                self.assertHTMLEqual(render('y')[1], '<p>[y]</p>')
+
+    def test_threaded_render(self):
+        import sys
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+
+        # A fresh engine, so threads also race to compile and cache templates.
+        engine = Engine(dirs=[os.path.join(BASE_DIR, 'templates')], debug=True,
+                        builtins=['mixin_templatetag.templatetags.mixins'])
+        template = engine.from_string("""
+            {% mixin name %}<i>{{ name }}</i>{% endmixin %}
+            {% component 'sub_component_main.html' %}
+                {% slot main_slot %}
+                    {% mix name %}
+                    {% component 'sub_component_sub2.html' with value=name only dedupe %}
+                        {% slot sub2_slot %}{{ value }}{% endslot %}
+                    {% endcomponent %}
+                {% endslot %}
+            {% endcomponent %}
+            {% component_for item in items 'slot_twice.html' %}
+                {% slot title %}{{ name }}{{ item }}{% endslot %}
+            {% endcomponent_for %}
+        """)
+        threads = 8
+        barrier = threading.Barrier(threads)
+
+        def render(index):
+            return template.render(Context({'name': 'n%d' % index, 'items': [index, index + 1]}))
+
+        def render_together(index):
+            if index < threads:
+                barrier.wait()
+            return render(index)
+
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            with ThreadPoolExecutor(threads) as executor:
+                outputs = list(executor.map(render_together, range(200)))
+        finally:
+            sys.setswitchinterval(interval)
+        self.assertIn('<i>n0</i>', outputs[0])
+        self.assertEqual(outputs, [render(index) for index in range(200)])
+
+
+@override_settings(MIXIN_TEMPLATETAG_COMPILE=True)
+class CompiledMixinTest(MixinTest):
+    """
+    Runs every test with component templates and mixins compiled into Python
+    functions.
+    """
+
+    def test_compiled_output(self):
+        from mixin_templatetag.compiler import compile_nodelist
+        from mixin_templatetag.templatecache import get_template_cache
+
+        template = Template("a{{ value|upper }}b{% if value %}c{% endif %}{{ html }}")
+        context = Context({'value': 'x', 'html': '<i>'})
+        for debug in (False, True):
+            render = compile_nodelist(template.nodelist, debug)
+            with context.bind_template(template):
+                self.assertEqual(render(context), template.nodelist.render(context))
+
+        Template("{% component 'sub_component_sub2.html' %}{% endcomponent %}").render(Context({}))
+        component = get_template_cache(Engine.get_default()).get_template('sub_component_sub2.html')
+        self.assertIn(True, component.nodelist.mixin_compiled)
+
+
+@unittest.skipUnless(jinja2, "Jinja2 isn't installed")
+class Jinja2MixinTest(SimpleTestCase):
+    """
+    The scenarios shared with MixinTest, and Jinja2's own, rendered by the
+    Jinja2 extension.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        if not settings.configured:
+            MixinTest.configure_settings()
+        super().setUpClass()
+
+    def setUp(self):
+        from django.template.backends.jinja2 import Jinja2
+
+        self.backend = Jinja2({
+            'NAME': 'jinja2',
+            'DIRS': [os.path.join(BASE_DIR, 'templates')],
+            'APP_DIRS': False,
+            'OPTIONS': {
+                'extensions': ['mixin_templatetag.jinja2ext.mixins'],
+                'undefined': jinja2.Undefined,
+            },
+        })
+
+    def render(self, source, context=None):
+        return self.backend.from_string(source).render(context)
+
+    def test_shared_scenarios(self):
+        # Syntax errors found while rendering are Jinja2's own before Django 3.1.
+        check_shared_scenarios(self, self.render, (TemplateSyntaxError, jinja2.TemplateError))
+
+    def test_component_must_not_extend(self):
+        with self.assertRaisesMessage(Exception, "Component template 'component_extends.html' must not extend"):
+            self.render("{% component 'component_extends.html' %}{% endcomponent %}")
+        # Worked out once per compiled template.
+        template = self.backend.env.get_template('sub_component_sub2.html')
+        self.render("{% component 'sub_component_sub2.html' %}{% endcomponent %}")
+        self.assertIsNone(template.mixin_templatetag_extends)
+
+    def test_mix_scope(self):
+        result = self.render("""
+            {% mixin foo %}{% set local = 'x' %}[{{ name }}{{ outer }}{{ range(2)|list|length }}]{% endmixin %}
+            {% for outer in 'ab' %}{% mix foo with name=outer|upper %}{% mix foo with name='c' only %}{% endfor %}
+            {{ local }}
+        """, {'outer': 'ignored'})
+        self.assertHTMLEqual(result, '[Aa2][c2][Bb2][c2]')
+
+    def test_mix_syntax(self):
+        from jinja2 import TemplateSyntaxError
+
+        for source in (
+            "{% mix foo %}",
+            "{% mixin foo %}{% endmixin %}{% mix foo with %}",
+            "{% mixin foo %}{% endmixin %}{% mix foo only only %}",
+            "{% mixin foo %}{% endmixin bar %}",
+        ):
+            with self.assertRaises(TemplateSyntaxError, msg=source):
+                self.backend.env.from_string(source)
+
+    def test_component_syntax(self):
+        from jinja2 import TemplateSyntaxError
+
+        for source in (
+            "{% component 'sub_component_sub2.html' %}text{% endcomponent %}",
+            "{% component 'sub_component_sub2.html' %}{% slot a %}{% endslot %}",
+            "{% component 'sub_component_sub2.html' cache 300 %}{% endcomponent %}",
+        ):
+            with self.assertRaises(TemplateSyntaxError, msg=source):
+                self.backend.env.from_string(source)